@@ -4,6 +4,7 @@ Django settings for ecommerce project.
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.middleware.PerformanceMiddleware',
+    'store.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +55,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'store.context_processors.cart_summary',
+                'store.context_processors.categories',
             ],
         },
     },
@@ -64,9 +69,68 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than SQLite's default in-memory test database, which other
+        # threads can only share with table locks (see store/tests/test_concurrency.py).
+        # It lives in the temp dir, named per test run so concurrent runs don't collide.
+        'TEST': {'NAME': Path(tempfile.gettempdir()) / f'ecommerce-test-{os.getpid()}.sqlite3'},
     }
 }
 
+# Read replicas
+# Catalog reads go to the aliases in STORE_DATABASE_REPLICAS (see store/routers.py).
+# To try it locally, copy db.sqlite3 and point SQLITE_REPLICA at the copy.
+if os.environ.get('SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['SQLITE_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['store.routers.ReplicaRouter']
+STORE_DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# How replicas are picked: 'random', 'round_robin' or 'ordered' (first available)
+STORE_REPLICA_SELECTION = 'random'
+# Seconds a replica that refused a connection is skipped for
+STORE_REPLICA_RETRY_SECONDS = 30
+# Seconds a visitor keeps reading from the primary after a POST, to see their own writes
+STORE_REPLICA_PIN_SECONDS = 5
+
+# Cache
+# Catalog reads are cached with versioned keys (see store/cache.py); the local
+# memory backend is enough for the single-process development server.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fashion-store',
+    }
+}
+
+# Full-page cache for anonymous visitors (seconds, 0 disables it)
+STORE_PAGE_CACHE_TIMEOUT = 0
+
+# Serve the catalog pages and AJAX cart endpoints from store.async_views (for ASGI servers)
+STORE_ASYNC_VIEWS = False
+
+# Request performance instrumentation (store.middleware.PerformanceMiddleware)
+STORE_PERFORMANCE_ENABLED = True
+STORE_PERFORMANCE_SAMPLE_RATE = 1.0
+STORE_PERFORMANCE_N_PLUS_ONE_THRESHOLD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'store.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
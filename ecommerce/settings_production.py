@@ -31,8 +31,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.middleware.PerformanceMiddleware',
+    'store.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add this for static files
+    'store.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise static files, ASGI-capable
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,6 +56,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'store.context_processors.cart_summary',
+                'store.context_processors.categories',
             ],
         },
     },
@@ -71,9 +75,97 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', ''),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Check reused connections before each request, so a restarted server costs no errors
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
     }
 }
 
+# Database connections
+# Opening a connection costs a TCP and authentication round trip on every request
+# unless it is reused. By default each thread keeps its connection open for
+# DB_CONN_MAX_AGE seconds, which suits the WSGI Procfile's sync workers. Under
+# ASGI (see README) every request's database work runs on a new thread, so those
+# connections would never be reused; set DB_POOL=true there to keep each worker's
+# connections in a pool shared by its threads instead.
+# Each worker opens at most DB_POOL_MAX_SIZE pooled connections, by default an equal
+# share of DB_MAX_CONNECTIONS across the WEB_CONCURRENCY workers (but at least one
+# per WEB_THREADS thread); keep the total below PostgreSQL's max_connections.
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '2'))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', '1'))
+if os.environ.get('DB_POOL', 'False').lower() == 'true':
+    DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', '80'))
+    DATABASES['default'].update({
+        'ENGINE': 'store.backends.postgresql_pool',
+        # Closing a connection at the end of a request returns it to the pool
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '0'))
+                or max(DB_MAX_CONNECTIONS // WEB_CONCURRENCY, WEB_THREADS, 1),
+                'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+            },
+        },
+    })
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+
+# Read replicas
+# DB_REPLICA_HOSTS lists replica servers ("host" or "host:port", comma-separated)
+# that serve catalog reads; they share the primary's credentials and connection
+# settings, pool included.
+DB_REPLICA_HOSTS = [host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+DATABASES.update({
+    f'replica_{number}': {
+        **DATABASES['default'],
+        'HOST': host.partition(':')[0],
+        'PORT': host.partition(':')[2] or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    for number, host in enumerate(DB_REPLICA_HOSTS, 1)
+})
+STORE_DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+STORE_REPLICA_SELECTION = os.environ.get('DB_REPLICA_SELECTION', 'random')
+STORE_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', '5'))
+
+# Cache
+# Cache versions must be shared by every worker for invalidation to reach them,
+# so set REDIS_URL whenever more than one worker runs. Without it each worker
+# keeps its own in-memory cache: nothing to set up and no query per lookup, but a
+# change only invalidates the cache of the worker that made it (see README).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'store',
+        }
+    }
+
+# Sessions are read on every request that has one; cached_db serves them from a
+# shared cache, signed_cookies keeps them out of the server entirely. Per-worker
+# caches would serve each other's stale sessions, so they read the database.
+SESSION_ENGINE = os.environ.get(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.cached_db' if os.environ.get('REDIS_URL') else 'django.contrib.sessions.backends.db',
+)
+
+# Opt-in full-page cache for anonymous visitors (seconds; 0, the default, disables it)
+STORE_PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', '0'))
+
+# Async catalog and cart views, for the gunicorn + uvicorn worker deployment (see README);
+# pair with DB_POOL=true
+STORE_ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() == 'true'
+
+# Request performance instrumentation, sampled to keep its overhead negligible
+STORE_PERFORMANCE_ENABLED = os.environ.get('PERFORMANCE_ENABLED', 'True').lower() == 'true'
+STORE_PERFORMANCE_SAMPLE_RATE = float(os.environ.get('PERFORMANCE_SAMPLE_RATE', '0.01'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -1,5 +1,51 @@
 from django.contrib import admin
-from .models import Category, Product, Cart, CartItem
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F
+from django.utils.functional import cached_property
+from .models import Category, Product, Cart, CartItem, Order, OrderLine
+
+
+class EstimatedCountPaginator(Paginator):
+    """Changelist paginator that never counts every row of a large table
+
+    An unfiltered changelist takes PostgreSQL's planner estimate of the table
+    size once it passes ESTIMATE_THRESHOLD rows. Otherwise at most COUNT_LIMIT
+    matching rows are counted, so a filter matching millions of rows pages
+    through the first COUNT_LIMIT of them.
+    """
+
+    ESTIMATE_THRESHOLD = 100000
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate > self.ESTIMATE_THRESHOLD:
+                return estimate
+        return queryset.order_by()[:self.COUNT_LIMIT].count()
+
+
+def estimate_row_count(model, using):
+    """Planner estimate of a model's table size on PostgreSQL, or 0 where there is none"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples is -1 until the table is first analyzed
+    return int(row[0]) if row else 0
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow without bound"""
+
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered count behind "N results (M total)"
+    show_full_result_count = False
 
 
 @admin.register(Category)
@@ -9,20 +55,58 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     list_display = ['name', 'category', 'gender', 'price', 'stock', 'available', 'created_at']
     list_filter = ['available', 'created_at', 'category', 'gender']
     list_editable = ['price', 'stock', 'available']
+    list_select_related = ['category']
     prepopulated_fields = {'slug': ('name',)}
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdmin):
+    # The totals are stored columns, kept up to date by the cart operations
     list_display = ['id', 'user', 'session_key', 'total_price', 'total_items', 'created_at']
+    list_select_related = ['user']
     readonly_fields = ['total_price', 'total_items']
+    raw_id_fields = ['user']
 
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
-    list_display = ['cart', 'product', 'quantity', 'total_price']
-    readonly_fields = ['total_price'] 
\ No newline at end of file
+class CartItemAdmin(LargeTableAdmin):
+    list_display = ['cart', 'product', 'quantity', 'line_total']
+    list_select_related = ['cart', 'product']
+    readonly_fields = ['total_price']
+    # Select boxes would list every cart and product
+    raw_id_fields = ['cart', 'product']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            line_total=F('quantity') * F('product__price'),
+        )
+
+    @admin.display(description='Total price', ordering='line_total')
+    def line_total(self, obj):
+        return obj.line_total
+
+
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    fields = ['product', 'product_name', 'price', 'quantity']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ['reference', 'user', 'email', 'total_items', 'total_price', 'created_at']
+    list_filter = ['created_at']
+    list_select_related = ['user']
+    search_fields = ['=reference', 'email']
+    readonly_fields = ['reference', 'total_items', 'total_price']
+    raw_id_fields = ['user']
+    inlines = [OrderLineInline]
@@ -0,0 +1,189 @@
+"""
+Async versions of the catalog pages and AJAX cart endpoints.
+
+Enabled with STORE_ASYNC_VIEWS under an ASGI server (see the README), where a
+worker keeps serving other requests while these wait on the database. Catalog
+reads use the async ORM. Session and user lookups, cache reads, the
+transactional cart mutations and template rendering (whose context processors
+query the database) are sync-only in Django 4.2, so they run through
+sync_to_async on the request's thread.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import redirect, render
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+
+from .cache import get_featured_products, get_menu_categories
+from .cart import (
+    InsufficientStock, add_item, aget_cart_summary, get_or_create_cart, owns_cart, remove_item, set_item_quantity,
+)
+from .decorators import cache_anonymous_page
+from .facets import build_facets, facet_rows, filter_products
+from .models import CartItem, Product
+from .recommendations import aget_related_products
+from .pagination import apaginate_keyset, apaginate_offset, get_page_size
+from .views import PRODUCT_SORT_FIELDS, RELEVANCE_ORDERING, listing_context, listing_query
+
+arender = sync_to_async(render)
+
+
+def is_ajax(request):
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
+@cache_anonymous_page
+async def home(request):
+    """Home page with featured products"""
+    featured_products = await sync_to_async(get_featured_products)()
+
+    context = {
+        'featured_products': featured_products,
+    }
+    return await arender(request, 'store/home.html', context)
+
+
+@cache_anonymous_page
+async def product_list(request):
+    """Product listing page with filtering"""
+    products, search_query, ranges, selected, sort_by = listing_query(request)
+
+    rows = await sync_to_async(facet_rows)(products, search_query, ranges)
+    categories = await sync_to_async(get_menu_categories)()
+    facets, product_count = build_facets(rows, selected, categories)
+    products = filter_products(products, selected)
+
+    page_size = get_page_size(request)
+    if sort_by == 'relevance':
+        page = await apaginate_offset(products.order_by(*RELEVANCE_ORDERING), request.GET.get('page'), page_size)
+    else:
+        page = await apaginate_keyset(
+            products, PRODUCT_SORT_FIELDS[sort_by], sort_by, request.GET.get('cursor'), page_size
+        )
+
+    context = listing_context(request, page, facets, product_count, search_query, ranges, selected, sort_by)
+    return await arender(request, 'store/product_list.html', context)
+
+
+@cache_anonymous_page
+async def product_detail(request, slug):
+    """Product detail page"""
+    try:
+        product = await Product.objects.select_related('category').aget(slug=slug, available=True)
+    except Product.DoesNotExist:
+        raise Http404('No Product matches the given query.')
+    related_products = await aget_related_products(product)
+
+    context = {
+        'product': product,
+        'related_products': related_products,
+    }
+    return await arender(request, 'store/product_detail.html', context)
+
+
+async def add_to_cart(request, product_id):
+    """Add product to cart"""
+    if request.method != 'POST':
+        return redirect('store:product_list')
+
+    try:
+        product = await Product.objects.aget(id=product_id, available=True)
+    except Product.DoesNotExist:
+        raise Http404('No Product matches the given query.')
+    quantity = int(request.POST.get('quantity', 1))
+
+    cart = await sync_to_async(get_or_create_cart)(request)
+    try:
+        await sync_to_async(add_item)(cart, product, max(quantity, 1))
+    except InsufficientStock:
+        message = f'Sorry, only {product.stock} of {product.name} in stock.'
+        if is_ajax(request):
+            return JsonResponse({'success': False, 'message': message}, status=409)
+        messages.error(request, message)
+        return redirect('store:product_detail', slug=product.slug)
+    await cart.arefresh_from_db(fields=['total_items', 'total_price'])
+
+    messages.success(request, f'{product.name} added to cart!')
+
+    if is_ajax(request):
+        return JsonResponse({
+            'success': True,
+            'message': f'{product.name} added to cart!',
+            'cart_total': cart.total_items
+        })
+    return redirect('store:cart')
+
+
+async def remove_from_cart(request, item_id):
+    """Remove item from cart"""
+    if request.method == 'POST':
+        try:
+            cart_item = await CartItem.objects.select_related('cart').aget(id=item_id)
+        except CartItem.DoesNotExist:
+            raise Http404('No CartItem matches the given query.')
+        cart = cart_item.cart
+
+        if await sync_to_async(owns_cart)(request, cart):
+            await sync_to_async(remove_item)(cart_item)
+            messages.success(request, 'Item removed from cart!')
+
+        if is_ajax(request):
+            await cart.arefresh_from_db(fields=['total_items', 'total_price'])
+            return JsonResponse({
+                'success': True,
+                'message': 'Item removed from cart!',
+                'cart_total': cart.total_items,
+                'cart_total_price': cart.total_price
+            })
+
+    return redirect('store:cart')
+
+
+async def update_cart_quantity(request, item_id):
+    """Update cart item quantity"""
+    if request.method == 'POST':
+        try:
+            cart_item = await CartItem.objects.select_related('cart', 'product').aget(id=item_id)
+        except CartItem.DoesNotExist:
+            raise Http404('No CartItem matches the given query.')
+        cart = cart_item.cart
+        message = None
+
+        if await sync_to_async(owns_cart)(request, cart):
+            quantity = int(request.POST.get('quantity', 1))
+            try:
+                await sync_to_async(set_item_quantity)(cart_item, quantity)
+            except InsufficientStock:
+                message = f'Sorry, only {cart_item.product.stock} of {cart_item.product.name} in stock.'
+                await cart_item.arefresh_from_db(fields=['quantity'])
+                if not is_ajax(request):
+                    messages.error(request, message)
+
+        if is_ajax(request):
+            await cart.arefresh_from_db(fields=['total_items', 'total_price'])
+            return JsonResponse({
+                'success': message is None,
+                'message': message,
+                'quantity': cart_item.quantity,
+                'cart_total': cart.total_items,
+                'item_total': cart_item.total_price,
+                'cart_total_price': cart.total_price
+            })
+
+    return redirect('store:cart')
+
+
+async def cart_summary(request):
+    """Cart item count and subtotal as JSON for the navbar badge"""
+    # require_GET only wraps sync views in Django 4.2
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    summary = await aget_cart_summary(request)
+    response = JsonResponse({
+        'cart_total': summary['cart_total'],
+        'cart_total_price': summary['cart_total_price'],
+    })
+
+    patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
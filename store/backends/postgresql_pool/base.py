@@ -0,0 +1,147 @@
+"""
+PostgreSQL backend that reuses connections from a per-process pool.
+
+Django 4.2 has no connection pooling of its own. With this backend, the
+connection Django closes at the end of every request (CONN_MAX_AGE = 0) goes
+back to a pool shared by all threads of the worker process instead of being
+disconnected, so the next request skips the TCP and authentication handshake.
+Unlike persistent connections, this also works under ASGI, where each
+request's database work runs on a new thread.
+
+The pool is configured through ``OPTIONS['pool']``::
+
+    'OPTIONS': {'pool': {'max_size': 20, 'timeout': 10}}
+
+Connections are opened on demand, up to ``max_size`` per process, and kept
+open once returned. When all of them are in use, requests wait up to
+``timeout`` seconds for one to come back. With CONN_HEALTH_CHECKS, an idle
+connection is pinged before it is handed out and replaced if the server has
+dropped it.
+"""
+import threading
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+from django.db.backends.postgresql import base
+
+from .creation import DatabaseCreation
+
+DEFAULT_POOL_OPTIONS = {'max_size': 10, 'timeout': 30}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections that waits for a free connection when exhausted"""
+
+    def __init__(self, conn_params, max_size, timeout):
+        self.conn_params = conn_params
+        self.timeout = timeout
+        self._idle = deque()
+        # One slot per connection that may be open, borrowed or idle
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def getconn(self, check=False):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise psycopg2.OperationalError(f'No pooled database connection became free within {self.timeout}s')
+        try:
+            while True:
+                try:
+                    connection = self._idle.pop()
+                except IndexError:
+                    return psycopg2.connect(**self.conn_params)
+                if not check or is_usable(connection):
+                    return connection
+                connection.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection):
+        """Take back a borrowed connection, keeping it only if it is still usable"""
+        try:
+            if connection.closed:
+                return
+            status = connection.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                connection.close()
+                return
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            self._idle.append(connection)
+        except psycopg2.Error:
+            connection.close()
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+def is_usable(connection):
+    """Ping a pooled connection, leaving it idle; False if it is closed or broken"""
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def get_pool(alias, conn_params, options):
+    """The process's pool for a database alias and connection parameters, created on first use"""
+    key = (alias, repr(sorted(conn_params.items())))
+    with _pools_lock:
+        if key not in _pools:
+            options = {**DEFAULT_POOL_OPTIONS, **options}
+            _pools[key] = ConnectionPool(conn_params, options['max_size'], options['timeout'])
+        return _pools[key]
+
+
+def close_pools(alias):
+    """Disconnect the idle pooled connections of a database alias"""
+    with _pools_lock:
+        pools = [pool for (pool_alias, _), pool in _pools.items() if pool_alias == alias]
+    for pool in pools:
+        pool.closeall()
+
+
+class PooledDatabase:
+    """psycopg2 module stand-in whose connect() borrows from a pool"""
+
+    def __init__(self, pool, check):
+        self.pool = pool
+        self.check = check
+
+    def connect(self, **conn_params):
+        return self.pool.getconn(check=self.check)
+
+    def __getattr__(self, name):
+        return getattr(psycopg2, name)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, conn_params, self.settings_dict['OPTIONS'].get('pool', {}))
+        # The parent sets up the borrowed connection exactly as it would a new one
+        self.Database = PooledDatabase(pool, self.settings_dict['CONN_HEALTH_CHECKS'])
+        return super().get_new_connection(conn_params)
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                return self.Database.pool.putconn(self.connection)
@@ -0,0 +1,10 @@
+from django.db.backends.postgresql import creation
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # PostgreSQL won't drop a database with open connections, idle pooled ones included
+        from .base import close_pools
+
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,95 @@
+"""
+Versioned read-through cache for catalog reads.
+
+Every cached value lives under a key that embeds the current version of its
+namespace. Saving or deleting a Category or Product bumps the matching version
+once the transaction commits (see ``store.signals``), so stale entries are simply never read again and age
+out of the cache on their own. Versions are kept in the cache itself, so all
+processes sharing a cache backend agree on them.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import Max
+
+from .models import Category, Product
+from .routers import use_primary
+
+CATEGORIES = 'categories'
+PRODUCTS = 'products'
+
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+FEATURED_PRODUCTS_LIMIT = 8
+
+# Process-local copy of the category list, tagged with the version it was read at
+_local_categories = (None, None)
+
+
+def _version_key(namespace):
+    return f'store:catalog:{namespace}:version'
+
+
+def get_version(namespace):
+    """Current version of a namespace, initialised on first use"""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock rather than 1 so a version lost to eviction can't
+        # come back and revive entries cached under it
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate everything cached under a namespace"""
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), time.time_ns(), timeout=None)
+
+
+def cached(namespace, name, fetch, timeout=CATALOG_CACHE_TIMEOUT):
+    """Return the cached value of `fetch()` for the current namespace version"""
+    key = f'store:catalog:{namespace}:{get_version(namespace)}:{name}'
+    value = cache.get(key)
+    if value is None:
+        # The version was just bumped by a write that a replica may not have yet,
+        # and whatever is read now stays cached until the next bump
+        with use_primary():
+            value = fetch()
+        cache.set(key, value, timeout)
+    return value
+
+
+def get_categories():
+    return cached(CATEGORIES, 'all', lambda: list(Category.objects.all()))
+
+
+def get_menu_categories():
+    """Category list for the navigation menu, held in process memory
+
+    Only the namespace version is read from the shared cache on each call; the
+    list itself is reused until a Category change bumps that version.
+    """
+    global _local_categories
+    version = get_version(CATEGORIES)
+    cached_version, categories = _local_categories
+    if cached_version != version:
+        categories = get_categories()
+        _local_categories = (version, categories)
+    return categories
+
+
+def get_featured_products():
+    return cached(PRODUCTS, 'featured', lambda: list(
+        Product.objects.filter(available=True).order_by('-created_at')[:FEATURED_PRODUCTS_LIMIT]
+    ))
+
+
+def get_catalog_last_modified():
+    """Latest Product.updated_at, recomputed only when the products version changes"""
+    return cached(PRODUCTS, 'last_modified', lambda: Product.objects.aggregate(
+        last_modified=Max('updated_at')
+    )['last_modified'] or 0)
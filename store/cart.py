@@ -0,0 +1,196 @@
+import secrets
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
+
+from .models import Cart, CartItem
+
+
+# Session entry holding the key of an anonymous visitor's cart
+CART_SESSION_KEY = 'store_cart_key'
+
+
+class InsufficientStock(Exception):
+    """Raised when a cart change would exceed the product's stock"""
+
+
+def get_anonymous_cart_key(request):
+    """Key of the anonymous visitor's cart (Cart.session_key), or None if they have none
+
+    The key is a random token kept in the session rather than the session id,
+    so it works with every session engine, including signed cookies.
+    """
+    key = request.session.get(CART_SESSION_KEY)
+    if key is None and hasattr(type(request.session), 'get_model_class'):
+        # Carts created before the key was kept in the session used the database session id
+        key = request.session.session_key
+    return key
+
+
+def get_cart_filter(request):
+    """Lookup kwargs identifying the current visitor's cart, or None if they have none"""
+    if request.user.is_authenticated:
+        return {'user': request.user}
+    key = get_anonymous_cart_key(request)
+    if key:
+        return {'session_key': key}
+    return None
+
+
+def get_cart(request):
+    """The visitor's cart, or None; never creates one"""
+    cart_filter = get_cart_filter(request)
+    if cart_filter is None:
+        return None
+    return Cart.objects.filter(**cart_filter).first()
+
+
+def get_or_create_cart(request):
+    """The visitor's cart, created on their first add to cart"""
+    if request.user.is_authenticated:
+        cart, created = Cart.objects.get_or_create(user=request.user)
+        return cart
+
+    cart = get_cart(request)
+    if cart is None:
+        cart = Cart.objects.create(session_key=secrets.token_hex(20))
+    if request.session.get(CART_SESSION_KEY) != cart.session_key:
+        request.session[CART_SESSION_KEY] = cart.session_key
+    return cart
+
+
+def get_cart_summary(request):
+    """Item count and subtotal of the visitor's cart, read from the stored totals"""
+    cart_filter = get_cart_filter(request)
+    totals = None
+    if cart_filter is not None:
+        totals = Cart.objects.filter(**cart_filter).values('total_items', 'total_price').first()
+    if totals is None:
+        return {'cart_total': 0, 'cart_total_price': Decimal('0.00')}
+
+    return {
+        'cart_total': totals['total_items'],
+        'cart_total_price': totals['total_price'],
+    }
+
+
+async def aget_cart_summary(request):
+    """Async version of get_cart_summary"""
+    # The visitor's user and session load lazily through the sync ORM
+    cart_filter = await sync_to_async(get_cart_filter)(request)
+    totals = None
+    if cart_filter is not None:
+        totals = await Cart.objects.filter(**cart_filter).values('total_items', 'total_price').afirst()
+    if totals is None:
+        return {'cart_total': 0, 'cart_total_price': Decimal('0.00')}
+
+    return {
+        'cart_total': totals['total_items'],
+        'cart_total_price': totals['total_price'],
+    }
+
+
+def reprice_carts(product_ids):
+    """Recompute the stored totals of every cart holding one of the products
+
+    Cart operations shift the totals by deltas at the current price, so a price
+    change or a product deleted out of carts has to rebuild them.
+    """
+    return Cart.objects.filter(items__product__in=product_ids).rebuild_totals()
+
+
+def owns_cart(request, cart):
+    """True if `cart` belongs to the current user or anonymous session"""
+    if request.user.is_authenticated:
+        return cart.user_id == request.user.id
+    return cart.session_key is not None and cart.session_key == get_anonymous_cart_key(request)
+
+
+def load_cart(cart):
+    """Prefetch a cart's items with their products and compute its totals in memory
+
+    The cart, its items and their products (with categories) are loaded in a fixed
+    number of queries regardless of cart size, and the totals are recomputed from
+    the fetched rows so rendering the cart never goes back to the database.
+    """
+    prefetch_related_objects([cart], Prefetch(
+        'items',
+        queryset=CartItem.objects.select_related('product__category')
+        .defer('product__search_vector')
+        .order_by('created_at', 'id'),
+    ))
+    items = cart.items.all()
+    cart.total_items = sum(item.quantity for item in items)
+    cart.total_price = sum((item.total_price for item in items), Decimal('0.00'))
+    return cart
+
+
+def cart_summary_for(cart):
+    """Summary in the shape of get_cart_summary for an already loaded cart, or None"""
+    if cart is None:
+        return {'cart_total': 0, 'cart_total_price': Decimal('0.00')}
+    return {
+        'cart_total': cart.total_items,
+        'cart_total_price': cart.total_price,
+    }
+
+
+def _increment_item(cart, product, quantity):
+    """Add to an existing line in one conditional UPDATE; False if there is no line or not enough stock"""
+    return CartItem.objects.filter(
+        cart=cart,
+        product=product,
+        quantity__lte=F('product__stock') - quantity,
+    ).update(quantity=F('quantity') + quantity) == 1
+
+
+def add_item(cart, product, quantity):
+    """Add `quantity` of `product` to the cart, safely under concurrent requests
+
+    The existing line is incremented in SQL, so simultaneous adds can't lose an
+    update, and only while the new quantity still fits in stock. A missing line
+    is inserted, and losing that insert to a concurrent request (caught by the
+    unique cart/product constraint) falls back to the increment.
+    """
+    with transaction.atomic():
+        if not _increment_item(cart, product, quantity):
+            if quantity > product.stock:
+                raise InsufficientStock(product)
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+            except IntegrityError:
+                if not _increment_item(cart, product, quantity):
+                    raise InsufficientStock(product)
+        cart.adjust_totals(quantity, product.price * quantity)
+
+
+def set_item_quantity(cart_item, quantity):
+    """Set a cart line's quantity, removing the line when it drops to zero"""
+    if quantity <= 0:
+        remove_item(cart_item)
+        return
+    with transaction.atomic():
+        # Lock the line so the totals delta is computed from its current quantity
+        current = CartItem.objects.select_for_update().select_related('product').get(pk=cart_item.pk)
+        updated = CartItem.objects.filter(
+            pk=cart_item.pk,
+            product__stock__gte=quantity,
+        ).update(quantity=quantity)
+        if not updated:
+            raise InsufficientStock(current.product)
+        delta = quantity - current.quantity
+        cart_item.cart.adjust_totals(delta, current.product.price * delta)
+    cart_item.quantity = quantity
+
+
+def remove_item(cart_item):
+    """Delete a cart line and take it out of the cart totals"""
+    with transaction.atomic():
+        current = CartItem.objects.select_for_update().select_related('product').filter(pk=cart_item.pk).first()
+        if current is None:
+            return
+        current.delete()
+        cart_item.cart.adjust_totals(-current.quantity, -current.total_price)
@@ -0,0 +1,18 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_menu_categories
+from .cart import get_cart_summary
+
+
+def cart_summary(request):
+    """Expose the cart item count and subtotal to every template"""
+    return {
+        'cart_summary': SimpleLazyObject(lambda: get_cart_summary(request)),
+    }
+
+
+def categories(request):
+    """Category list for the navbar menu, served from the in-process cache"""
+    return {
+        'categories': SimpleLazyObject(get_menu_categories),
+    }
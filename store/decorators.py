@@ -0,0 +1,140 @@
+import hashlib
+import re
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import cache as catalog_cache
+from .cart import get_cart_summary
+
+# Query parameters that change what the cached storefront views render
+PAGE_CACHE_PARAMS = (
+    'category', 'gender', 'price', 'in_stock', 'min_price', 'max_price', 'on_sale', 'min_discount',
+    'search', 'sort', 'cursor', 'page', 'per_page',
+)
+
+CSRF_PLACEHOLDER = '__store_csrf_token__'
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def is_anonymous_browser(request):
+    """True for visitors whose pages don't depend on who they are
+
+    Logged-in users, visitors with items in their cart and anyone with a
+    pending flash message get a freshly rendered page.
+    """
+    if request.user.is_authenticated:
+        return False
+    if get_cart_summary(request)['cart_total']:
+        return False
+    return not len(get_messages(request))
+
+
+def page_cache_key(request, view_name, view_kwargs):
+    """Cache key from the view, its URL kwargs, the normalized query string and the catalog versions"""
+    query = sorted(
+        (name, ' '.join(value.split()))
+        for name in PAGE_CACHE_PARAMS
+        for value in request.GET.getlist(name)
+        if value.strip()
+    )
+    parts = [
+        view_name,
+        repr(sorted(view_kwargs.items())),
+        repr(query),
+        str(catalog_cache.get_version(catalog_cache.CATEGORIES)),
+        str(catalog_cache.get_version(catalog_cache.PRODUCTS)),
+    ]
+    digest = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'store:page:{view_name}:{digest}'
+
+
+def _lookup_page(request, view_name, view_kwargs):
+    """(key, etag, last_modified, response) for a cacheable request, or None to bypass the cache
+
+    `response` is a 304 or the cached page, or None when the view has to run.
+    """
+    timeout = getattr(settings, 'STORE_PAGE_CACHE_TIMEOUT', 0)
+    if not timeout or request.method not in ('GET', 'HEAD') or not is_anonymous_browser(request):
+        return None
+
+    key = page_cache_key(request, view_name, view_kwargs)
+    last_modified = catalog_cache.get_catalog_last_modified()
+    last_modified = last_modified.timestamp() if last_modified else None
+    etag = quote_etag(key.rsplit(':', 1)[-1])
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(
+                content.replace(CSRF_PLACEHOLDER, get_token(request)),
+                content_type=content_type,
+            )
+    return key, etag, last_modified, response
+
+
+def _store_page(key, response):
+    """Cache a freshly rendered page; returns False for responses that can't be cached"""
+    if response.status_code != 200 or response.streaming:
+        return False
+    content = CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', response.content.decode(response.charset))
+    cache.set(key, (content, response['Content-Type']), getattr(settings, 'STORE_PAGE_CACHE_TIMEOUT', 0))
+    return True
+
+
+def _finish_page(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Browsers must revalidate, and shared caches must not hand the page to visitors with a cart
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def cache_anonymous_page(view_func):
+    """Serve a view from the full-page cache for anonymous visitors with an empty cart
+
+    Enabled by a positive STORE_PAGE_CACHE_TIMEOUT. Responses carry an ETag and a
+    Last-Modified date derived from the newest Product.updated_at, so conditional
+    GETs are answered with a 304 before anything is rendered. Cached pages keep a
+    placeholder where the CSRF token goes and get the visitor's own token on the
+    way out. Works on both sync and async views.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            lookup = await sync_to_async(_lookup_page)(request, view_func.__name__, kwargs)
+            if lookup is None:
+                return await view_func(request, *args, **kwargs)
+            key, etag, last_modified, response = lookup
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+                if not await sync_to_async(_store_page)(key, response):
+                    return response
+            return _finish_page(response, etag, last_modified)
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        lookup = _lookup_page(request, view_func.__name__, kwargs)
+        if lookup is None:
+            return view_func(request, *args, **kwargs)
+        key, etag, last_modified, response = lookup
+        if response is None:
+            response = view_func(request, *args, **kwargs)
+            if not _store_page(key, response):
+                return response
+        return _finish_page(response, etag, last_modified)
+
+    return wrapper
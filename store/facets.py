@@ -0,0 +1,189 @@
+"""
+Filters and facet counts for the product listing.
+
+All facet counts come from one grouped aggregate over the products matching
+the search query and range filters, bucketed by category, gender, price band
+and stock. The grouped rows are small (one per combination of those values)
+and cached under the catalog versions per search and range combination, so
+every facet selection is rolled up from them in Python. Each facet's counts
+ignore that facet's own selection, which lets the sidebar show how many
+products each alternative would give.
+"""
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Case, Count, Q, Value, When
+
+from . import cache
+from .models import Product
+
+FACET_CACHE_TIMEOUT = 15 * 60
+
+# Price bands as (key, label, lower bound, upper bound); bounds are inclusive / exclusive
+PRICE_BANDS = (
+    ('under-25', 'Under $25', None, Decimal('25')),
+    ('25-50', '$25 to $50', Decimal('25'), Decimal('50')),
+    ('50-100', '$50 to $100', Decimal('50'), Decimal('100')),
+    ('100-plus', '$100 & above', Decimal('100'), None),
+)
+
+FACET_PARAMS = ('category', 'gender', 'price', 'in_stock')
+
+# Discount thresholds offered by the minimum discount filter
+DISCOUNT_STEPS = (10, 20, 30, 50)
+
+
+def get_range_filters(request):
+    """Price range, on-sale and minimum discount filters from the query string
+
+    Values that don't parse are dropped rather than failing the page.
+    """
+    ranges = {}
+    for param in ('min_price', 'max_price'):
+        try:
+            value = Decimal(request.GET.get(param, '').strip())
+        except InvalidOperation:
+            continue
+        if value.is_finite() and value >= 0:
+            ranges[param] = value
+    if request.GET.get('on_sale') == '1':
+        ranges['on_sale'] = True
+    try:
+        min_discount = int(request.GET.get('min_discount', ''))
+    except ValueError:
+        min_discount = 0
+    if 0 < min_discount <= 100:
+        ranges['min_discount'] = min_discount
+    return ranges
+
+
+def filter_ranges(queryset, ranges):
+    """Apply range filters; the discount ones use the partial discount index"""
+    if 'min_price' in ranges:
+        queryset = queryset.filter(price__gte=ranges['min_price'])
+    if 'max_price' in ranges:
+        queryset = queryset.filter(price__lte=ranges['max_price'])
+    min_discount = max(ranges.get('min_discount', 0), 1 if ranges.get('on_sale') else 0)
+    if min_discount:
+        queryset = queryset.filter(discount_percentage__gte=min_discount)
+    return queryset
+
+
+def get_selected_facets(request):
+    """Facet selections from the query string, ignoring values that aren't facets"""
+    selected = {}
+    category = request.GET.get('category')
+    if category:
+        selected['category'] = category
+    gender = request.GET.get('gender')
+    if gender in dict(Product.GENDER_CHOICES):
+        selected['gender'] = gender
+    price = request.GET.get('price')
+    if price in {band[0] for band in PRICE_BANDS}:
+        selected['price'] = price
+    if request.GET.get('in_stock') == '1':
+        selected['in_stock'] = True
+    return selected
+
+
+def price_band_filter(key):
+    for band_key, _, low, high in PRICE_BANDS:
+        if band_key == key:
+            condition = Q()
+            if low is not None:
+                condition &= Q(price__gte=low)
+            if high is not None:
+                condition &= Q(price__lt=high)
+            return condition
+    return Q()
+
+
+def filter_products(queryset, selected):
+    """Apply facet selections to a product queryset"""
+    if 'category' in selected:
+        queryset = queryset.filter(category__slug=selected['category'])
+    if 'gender' in selected:
+        queryset = queryset.filter(gender=selected['gender'])
+    if 'price' in selected:
+        queryset = queryset.filter(price_band_filter(selected['price']))
+    if selected.get('in_stock'):
+        queryset = queryset.filter(stock__gt=0)
+    return queryset
+
+
+def _price_band_case():
+    return Case(
+        *[When(price_band_filter(key), then=Value(key)) for key, _, _, _ in PRICE_BANDS],
+        default=Value(''),
+    )
+
+
+def facet_rows(queryset, search_query='', ranges=None):
+    """Product counts grouped by every facet, for products in `queryset`
+
+    `queryset` must not have facet filters applied; `search_query` and
+    `ranges` are the search and range filters it has, and key the cache.
+    """
+    filters = repr((search_query, sorted((ranges or {}).items())))
+    name = 'facets:%s:%s' % (
+        cache.get_version(cache.CATEGORIES),
+        hashlib.md5(filters.encode(), usedforsecurity=False).hexdigest(),
+    )
+    return cache.cached(cache.PRODUCTS, name, lambda: list(
+        queryset.order_by().annotate(
+            price_band=_price_band_case(),
+            in_stock=Case(When(stock__gt=0, then=Value(True)), default=Value(False)),
+        ).values_list('category_id', 'gender', 'price_band', 'in_stock').annotate(count=Count('id'))
+    ), FACET_CACHE_TIMEOUT)
+
+
+def build_facets(rows, selected, categories):
+    """Roll grouped rows up into facet counts and the number of matching products
+
+    Returns ``(facets, total)`` where ``facets`` maps each facet name to a list
+    of ``{'value', 'label', 'count', 'selected'}`` entries.
+    """
+    categories_by_id = {category.id: category for category in categories}
+    selected_category = next(
+        (category.id for category in categories if category.slug == selected.get('category')), None
+    )
+    wanted = {
+        'category': selected_category if 'category' in selected else None,
+        'gender': selected.get('gender'),
+        'price': selected.get('price'),
+        'in_stock': True if selected.get('in_stock') else None,
+    }
+    counts = {facet: {} for facet in FACET_PARAMS}
+    total = 0
+    for category_id, gender, price_band, in_stock, count in rows:
+        values = {'category': category_id, 'gender': gender, 'price': price_band, 'in_stock': bool(in_stock)}
+        mismatched = [facet for facet in FACET_PARAMS if facet in selected and values[facet] != wanted[facet]]
+        if not mismatched:
+            total += count
+        # A row counts towards a facet if it matches every other facet's selection
+        for facet in FACET_PARAMS:
+            if not mismatched or mismatched == [facet]:
+                counts[facet][values[facet]] = counts[facet].get(values[facet], 0) + count
+
+    facets = {
+        'category': [
+            {'value': category.slug, 'label': category.name,
+             'count': counts['category'].get(category.id, 0), 'selected': category.id == selected_category}
+            for category in categories_by_id.values()
+        ],
+        'gender': [
+            {'value': value, 'label': label,
+             'count': counts['gender'].get(value, 0), 'selected': value == wanted['gender']}
+            for value, label in Product.GENDER_CHOICES
+        ],
+        'price': [
+            {'value': key, 'label': label,
+             'count': counts['price'].get(key, 0), 'selected': key == wanted['price']}
+            for key, label, _, _ in PRICE_BANDS
+        ],
+        'in_stock': [
+            {'value': '1', 'label': 'In stock only',
+             'count': counts['in_stock'].get(True, 0), 'selected': bool(wanted['in_stock'])}
+        ],
+    }
+    return facets, total
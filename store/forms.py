@@ -0,0 +1,12 @@
+from django import forms
+
+from .models import Order
+
+
+class CheckoutForm(forms.ModelForm):
+    """Shipping details collected at checkout"""
+
+    class Meta:
+        model = Order
+        fields = ['first_name', 'last_name', 'email', 'phone', 'address', 'city', 'state', 'zip_code']
+        labels = {'zip_code': 'ZIP Code'}
@@ -0,0 +1,156 @@
+"""
+Fixed-width image renditions for product and category images.
+
+Renditions are generated with Pillow when an image is uploaded (see
+``store.signals``), by the commands that store images in bulk, and by the
+build_renditions command for anything older. Each source image is decoded once
+and every width and format is encoded from it. They are stored under
+``MEDIA_ROOT/renditions/`` with names derived from the source image's content
+hash, so a replaced image never reuses stale renditions and identical images
+share them.
+
+Rendering a page only looks renditions up: the URLs found are remembered in the
+cache, and an image without renditions is served as-is and looked up again
+after RENDITION_MISS_TIMEOUT.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from . import cache as catalog_cache
+
+logger = logging.getLogger('store.images')
+
+RENDITION_WIDTHS = (320, 480, 800)
+
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+RENDITION_QUALITY = 80
+
+RENDITION_PREFIX = 'renditions/'
+
+# Seconds before an image found without renditions (or unreadable) is looked up again
+RENDITION_MISS_TIMEOUT = 5 * 60
+
+
+def _source_digest(name):
+    """Content hash of a stored image, memoized by name"""
+    key = f'store:image-digest:{name}'
+    digest = cache.get(key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with default_storage.open(name) as source:
+            for chunk in source.chunks():
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        cache.set(key, digest, None)
+    return digest
+
+
+def _rendition_name(digest, width, fmt):
+    return f'{RENDITION_PREFIX}{digest[:2]}/{digest}-{width}w.{fmt}'
+
+
+def _cache_key(name, fmt):
+    return f'store:renditions:{name}:{fmt}'
+
+
+def rendition_widths(source_width):
+    """Widths generated for a source image
+
+    Widths larger than the source are skipped, except that a source narrower
+    than the smallest width is still re-encoded once so it gets a compressed variant.
+    """
+    widths = [width for width in RENDITION_WIDTHS if width <= source_width]
+    return widths or [RENDITION_WIDTHS[0]]
+
+
+def _encode(image, width, image_format):
+    if image.width > width:
+        image = image.resize((width, image.height * width // image.width or 1), Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = BytesIO()
+    image.save(output, image_format, quality=RENDITION_QUALITY)
+    return output.getvalue()
+
+
+def generate_renditions(name):
+    """Write any missing renditions of a stored image; False if it can't be resized
+
+    The source is only decoded when something is missing, and then once for
+    every width and format.
+    """
+    try:
+        digest = _source_digest(name)
+        with default_storage.open(name) as source:
+            image = Image.open(source)
+            # Opening reads just the header, which is enough to know the widths
+            wanted = [
+                (fmt, width)
+                for fmt in RENDITION_FORMATS
+                for width in rendition_widths(image.width)
+                if not default_storage.exists(_rendition_name(digest, width, fmt))
+            ]
+            if wanted:
+                image.load()
+        for fmt, width in wanted:
+            image_format, _ = RENDITION_FORMATS[fmt]
+            default_storage.save(_rendition_name(digest, width, fmt), ContentFile(_encode(image, width, image_format)))
+    except (OSError, UnidentifiedImageError, ValueError) as e:
+        # Missing files and formats Pillow can't read (such as SVG) are served as-is
+        logger.warning('Could not generate renditions of %s: %s', name, e)
+        return False
+    cache.delete_many([_cache_key(name, fmt) for fmt in RENDITION_FORMATS])
+    return True
+
+
+def _find_renditions(name, fmt):
+    renditions = []
+    digest = _source_digest(name)
+    # Widths are generated smallest first, so the first missing one ends the list
+    for width in RENDITION_WIDTHS:
+        rendition_name = _rendition_name(digest, width, fmt)
+        if not default_storage.exists(rendition_name):
+            break
+        renditions.append((default_storage.url(rendition_name), width))
+    return renditions
+
+
+def get_renditions(image_field, fmt):
+    """List of (url, width) renditions of an image in `fmt`, or [] if there are none yet"""
+    if not image_field:
+        return []
+    name = image_field.name
+    key = _cache_key(name, fmt)
+    renditions = cache.get(key)
+    if renditions is None:
+        try:
+            renditions = _find_renditions(name, fmt)
+        except OSError:
+            renditions = []
+        cache.set(key, renditions, None if renditions else RENDITION_MISS_TIMEOUT)
+    return renditions
+
+
+def set_product_image(products, name):
+    """Point a queryset of products at a stored image, or at the placeholder with ''
+
+    One UPDATE skips the save signals, so the renditions and the catalog cache
+    invalidation they would have done happen here. Returns the number updated.
+    """
+    if name:
+        generate_renditions(name)
+    updated = products.update(image=name, updated_at=timezone.now())
+    transaction.on_commit(lambda: catalog_cache.bump_version(catalog_cache.PRODUCTS))
+    return updated
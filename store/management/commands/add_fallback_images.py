@@ -1,77 +1,46 @@
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
-from django.core.files.base import ContentFile
+from django.db.models import Q
+from store.images import set_product_image
 from store.models import Product
-import base64
+
+# Name suffix of the per-product SVG files this command used to write
+LEGACY_FALLBACK_SUFFIX = '_fallback.svg'
+
+UPDATE_BATCH_SIZE = 500
 
 
 class Command(BaseCommand):
-    help = 'Add fallback images for products that failed to download'
+    help = 'Switch every product without a usable image to the generated placeholder'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-files', action='store_true',
+            help='Also treat products whose image file is missing from storage as having no image',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write('Adding fallback images...')
         
-        # Create a simple colored placeholder image
-        # This is a 1x1 pixel PNG with a light gray color
-        placeholder_png = base64.b64decode(
-            'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
-        )
-        
-        # Products that need fallback images
-        fallback_products = [
-            'vneck-tshirt-men',
-            'high-waist-skinny-jeans-women', 
-            'oxford-button-down-shirt-men',
-            'oversized-hoodie-women',
-            'denim-jacket-men',
-            'bomber-jacket-men',
-            'leather-jacket-women'
-        ]
+        # Products with an empty image are served the placeholder already; old
+        # per-product SVG fallbacks are switched over to it as well
+        broken_ids = []
+        if options['verify_files']:
+            products = Product.objects.exclude(image='').exclude(
+                image__endswith=LEGACY_FALLBACK_SUFFIX
+            ).values_list('id', 'image')
+            for product_id, image_name in products.iterator(chunk_size=2000):
+                if not default_storage.exists(image_name):
+                    broken_ids.append(product_id)
         
-        for slug in fallback_products:
-            try:
-                product = Product.objects.get(slug=slug)
-                
-                # Create a colored placeholder based on product type
-                if 'tshirt' in slug:
-                    color = '#3498db'  # Blue for t-shirts
-                elif 'jeans' in slug:
-                    color = '#2c3e50'  # Dark blue for jeans
-                elif 'shirt' in slug:
-                    color = '#e74c3c'  # Red for shirts
-                elif 'hoodie' in slug:
-                    color = '#f39c12'  # Orange for hoodies
-                elif 'jacket' in slug:
-                    color = '#8e44ad'  # Purple for jackets
-                else:
-                    color = '#95a5a6'  # Gray default
-                
-                # Create a simple SVG placeholder
-                svg_content = f'''<svg width="500" height="500" xmlns="http://www.w3.org/2000/svg">
-                    <rect width="500" height="500" fill="{color}"/>
-                    <text x="250" y="250" font-family="Arial" font-size="24" fill="white" text-anchor="middle" dominant-baseline="middle">
-                        {product.name}
-                    </text>
-                </svg>'''
-                
-                # Save as SVG file
-                image_name = f"{slug}_fallback.svg"
-                image_file = ContentFile(svg_content.encode('utf-8'), name=image_name)
-                
-                product.image.save(image_name, image_file, save=True)
-                
-                self.stdout.write(
-                    self.style.SUCCESS(f'Added fallback image for: {product.name}')
-                )
-                
-            except Product.DoesNotExist:
-                self.stdout.write(
-                    self.style.ERROR(f'Product not found: {slug}')
-                )
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Error processing {slug}: {str(e)}')
-                )
+        updated = set_product_image(Product.objects.filter(image__endswith=LEGACY_FALLBACK_SUFFIX), '')
+        for start in range(0, len(broken_ids), UPDATE_BATCH_SIZE):
+            updated += set_product_image(Product.objects.filter(pk__in=broken_ids[start:start + UPDATE_BATCH_SIZE]), '')
         
+        total = Product.objects.filter(Q(image='') | Q(image__isnull=True)).count()
         self.stdout.write(
-            self.style.SUCCESS('Successfully added fallback images!')
-        ) 
\ No newline at end of file
+            self.style.SUCCESS(
+                f'Successfully added fallback images! {updated} products switched, '
+                f'{total} products now use the placeholder.'
+            )
+        )
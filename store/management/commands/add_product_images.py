@@ -1,97 +1,199 @@
-from django.core.management.base import BaseCommand
+import hashlib
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+
 from django.core.files.base import ContentFile
-from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
 import requests
-import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from PIL import Image
+from store.images import set_product_image
 from store.models import Product
-from io import BytesIO
+
+# Downloaded images are stored once per distinct content under this prefix
+IMAGE_STORE_PREFIX = 'products/sha256/'
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+
+# Product image mappings - using Unsplash images
+PRODUCT_IMAGES = {
+    # Men's T-Shirts
+    'classic-cotton-tshirt-men': 'https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=500&h=500&fit=crop',
+    'graphic-print-tshirt-men': 'https://images.unsplash.com/photo-1503341504253-dff4815485f1?w=500&h=500&fit=crop',
+    'vneck-tshirt-men': 'https://images.unsplash.com/photo-1434389677669-e08b5c80b8b0?w=500&h=500&fit=crop',
+
+    # Women's T-Shirts
+    'fitted-cotton-tshirt-women': 'https://images.unsplash.com/photo-1489980557514-251d61e3eeb6?w=500&h=500&fit=crop',
+    'crop-top-tshirt-women': 'https://images.unsplash.com/photo-1551698618-1dfe5d97d256?w=500&h=500&fit=crop',
+
+    # Men's Jeans
+    'slim-fit-jeans-men': 'https://images.unsplash.com/photo-1542272604-787c3835535d?w=500&h=500&fit=crop',
+    'straight-leg-jeans-men': 'https://images.unsplash.com/photo-1541099649105-f69ad21f3246?w=500&h=500&fit=crop',
+
+    # Women's Jeans
+    'high-waist-skinny-jeans-women': 'https://images.unsplash.com/photo-1544966503-7cc5ac882d5f?w=500&h=500&fit=crop',
+    'mom-fit-jeans-women': 'https://images.unsplash.com/photo-1542272604-787c3835535d?w=500&h=500&fit=crop',
+
+    # Women's Dresses
+    'summer-floral-dress-women': 'https://images.unsplash.com/photo-1515372039744-b8f02a3ae446?w=500&h=500&fit=crop',
+    'little-black-dress-women': 'https://images.unsplash.com/photo-1595777457583-95e059d581b8?w=500&h=500&fit=crop',
+    'casual-maxi-dress-women': 'https://images.unsplash.com/photo-1515372039744-b8f02a3ae446?w=500&h=500&fit=crop',
+
+    # Men's Shirts
+    'oxford-button-down-shirt-men': 'https://images.unsplash.com/photo-1596755094514-f87e34085b39?w=500&h=500&fit=crop',
+    'polo-shirt-men': 'https://images.unsplash.com/photo-1586790170083-2f9ceadc732d?w=500&h=500&fit=crop',
+
+    # Women's Shirts
+    'silk-blouse-women': 'https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=500&h=500&fit=crop',
+    'chiffon-top-women': 'https://images.unsplash.com/photo-1551698618-1dfe5d97d256?w=500&h=500&fit=crop',
+
+    # Men's Hoodies
+    'fleece-hoodie-men': 'https://images.unsplash.com/photo-1556821840-3a63f95609a7?w=500&h=500&fit=crop',
+    'zip-up-hoodie-men': 'https://images.unsplash.com/photo-1556821840-3a63f95609a7?w=500&h=500&fit=crop',
+
+    # Women's Hoodies
+    'oversized-hoodie-women': 'https://images.unsplash.com/photo-1556821840-3a63f95609a7?w=500&h=500&fit=crop',
+
+    # Men's Jackets
+    'denim-jacket-men': 'https://images.unsplash.com/photo-1544966503-7cc5ac882d5f?w=500&h=500&fit=crop',
+    'bomber-jacket-men': 'https://images.unsplash.com/photo-1544966503-7cc5ac882d5f?w=500&h=500&fit=crop',
+
+    # Women's Jackets
+    'blazer-jacket-women': 'https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=500&h=500&fit=crop',
+    'leather-jacket-women': 'https://images.unsplash.com/photo-1544966503-7cc5ac882d5f?w=500&h=500&fit=crop',
+}
 
 
 class Command(BaseCommand):
     help = 'Add real product images from Unsplash'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mapping',
+            help='JSON file of {"product-slug": "image URL"} to use instead of the built-in Unsplash images',
+        )
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent downloads (default: 8)')
+        parser.add_argument('--retries', type=int, default=3, help='Retries per URL on errors (default: 3)')
+        parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds (default: 10)')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Download again for products that already have a stored image',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Adding real product images...')
         
-        # Product image mappings - using Unsplash images
-        product_images = {
-            # Men's T-Shirts
-            'classic-cotton-tshirt-men': 'https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=500&h=500&fit=crop',
-            'graphic-print-tshirt-men': 'https://images.unsplash.com/photo-1503341504253-dff4815485f1?w=500&h=500&fit=crop',
-            'vneck-tshirt-men': 'https://images.unsplash.com/photo-1434389677669-e08b5c80b8b0?w=500&h=500&fit=crop',
-            
-            # Women's T-Shirts
-            'fitted-cotton-tshirt-women': 'https://images.unsplash.com/photo-1489980557514-251d61e3eeb6?w=500&h=500&fit=crop',
-            'crop-top-tshirt-women': 'https://images.unsplash.com/photo-1551698618-1dfe5d97d256?w=500&h=500&fit=crop',
-            
-            # Men's Jeans
-            'slim-fit-jeans-men': 'https://images.unsplash.com/photo-1542272604-787c3835535d?w=500&h=500&fit=crop',
-            'straight-leg-jeans-men': 'https://images.unsplash.com/photo-1541099649105-f69ad21f3246?w=500&h=500&fit=crop',
-            
-            # Women's Jeans
-            'high-waist-skinny-jeans-women': 'https://images.unsplash.com/photo-1544966503-7cc5ac882d5f?w=500&h=500&fit=crop',
-            'mom-fit-jeans-women': 'https://images.unsplash.com/photo-1542272604-787c3835535d?w=500&h=500&fit=crop',
-            
-            # Women's Dresses
-            'summer-floral-dress-women': 'https://images.unsplash.com/photo-1515372039744-b8f02a3ae446?w=500&h=500&fit=crop',
-            'little-black-dress-women': 'https://images.unsplash.com/photo-1595777457583-95e059d581b8?w=500&h=500&fit=crop',
-            'casual-maxi-dress-women': 'https://images.unsplash.com/photo-1515372039744-b8f02a3ae446?w=500&h=500&fit=crop',
-            
-            # Men's Shirts
-            'oxford-button-down-shirt-men': 'https://images.unsplash.com/photo-1596755094514-f87e34085b39?w=500&h=500&fit=crop',
-            'polo-shirt-men': 'https://images.unsplash.com/photo-1586790170083-2f9ceadc732d?w=500&h=500&fit=crop',
-            
-            # Women's Shirts
-            'silk-blouse-women': 'https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=500&h=500&fit=crop',
-            'chiffon-top-women': 'https://images.unsplash.com/photo-1551698618-1dfe5d97d256?w=500&h=500&fit=crop',
-            
-            # Men's Hoodies
-            'fleece-hoodie-men': 'https://images.unsplash.com/photo-1556821840-3a63f95609a7?w=500&h=500&fit=crop',
-            'zip-up-hoodie-men': 'https://images.unsplash.com/photo-1556821840-3a63f95609a7?w=500&h=500&fit=crop',
-            
-            # Women's Hoodies
-            'oversized-hoodie-women': 'https://images.unsplash.com/photo-1556821840-3a63f95609a7?w=500&h=500&fit=crop',
-            
-            # Men's Jackets
-            'denim-jacket-men': 'https://images.unsplash.com/photo-1544966503-7cc5ac882d5f?w=500&h=500&fit=crop',
-            'bomber-jacket-men': 'https://images.unsplash.com/photo-1544966503-7cc5ac882d5f?w=500&h=500&fit=crop',
-            
-            # Women's Jackets
-            'blazer-jacket-women': 'https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=500&h=500&fit=crop',
-            'leather-jacket-women': 'https://images.unsplash.com/photo-1544966503-7cc5ac882d5f?w=500&h=500&fit=crop',
-        }
+        product_images = PRODUCT_IMAGES
+        if options['mapping']:
+            try:
+                with open(options['mapping'], encoding='utf-8') as mapping_file:
+                    product_images = json.load(mapping_file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read mapping: {e}')
         
+        # Several products share a source image, so each URL is fetched once
+        slugs_by_url = defaultdict(list)
+        skipped = 0
+        products = Product.objects.filter(slug__in=product_images.keys()).values_list('slug', 'image')
+        existing = dict(products)
         for slug, image_url in product_images.items():
-            try:
-                product = Product.objects.get(slug=slug)
-                
-                # Download image
-                response = requests.get(image_url, timeout=10)
-                if response.status_code == 200:
-                    # Create image file
-                    image_name = f"{slug}.jpg"
-                    image_file = ContentFile(response.content, name=image_name)
-                    
-                    # Save image to product
-                    product.image.save(image_name, image_file, save=True)
-                    
-                    self.stdout.write(
-                        self.style.SUCCESS(f'Added image for: {product.name}')
-                    )
-                else:
+            if slug not in existing:
+                self.stdout.write(self.style.ERROR(f'Product not found: {slug}'))
+            elif options['force'] or not existing[slug].startswith(IMAGE_STORE_PREFIX):
+                slugs_by_url[image_url].append(slug)
+            else:
+                # Products already pointing at the content store were done by an earlier run
+                skipped += 1
+        if skipped:
+            self.stdout.write(f'Skipped {skipped} products that already have a stored image')
+        
+        if not slugs_by_url:
+            self.stdout.write(self.style.SUCCESS('All product images are already stored!'))
+            return
+        
+        workers = max(1, options['workers'])
+        session = self.build_session(workers, options['retries'])
+        failed = 0
+        
+        # Downloads run in the pool; storage and database writes stay on this thread
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.download, session, image_url, options['timeout']): image_url
+                for image_url in slugs_by_url
+            }
+            for future in as_completed(futures):
+                image_url = futures[future]
+                slugs = slugs_by_url[image_url]
+                try:
+                    content, content_type = future.result()
+                except requests.RequestException as e:
+                    failed += len(slugs)
                     self.stdout.write(
-                        self.style.WARNING(f'Failed to download image for: {product.name}')
+                        self.style.WARNING(f'Failed to download image for: {", ".join(slugs)} ({e})')
                     )
-                    
-            except Product.DoesNotExist:
-                self.stdout.write(
-                    self.style.ERROR(f'Product not found: {slug}')
-                )
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Error processing {slug}: {str(e)}')
-                )
+                    continue
+                if not is_image(content):
+                    failed += len(slugs)
+                    self.stdout.write(self.style.WARNING(f'Not an image for: {", ".join(slugs)} ({image_url})'))
+                    continue
+                
+                image_name = self.store(content, content_type)
+                set_product_image(Product.objects.filter(slug__in=slugs), image_name)
+                for slug in slugs:
+                    self.stdout.write(self.style.SUCCESS(f'Added image for: {slug}'))
         
+        session.close()
+        
+        if failed:
+            self.stdout.write(
+                self.style.WARNING(f'{failed} products still need images; run the command again to retry them')
+            )
         self.stdout.write(
             self.style.SUCCESS('Successfully added product images!')
-        ) 
\ No newline at end of file
+        )
+
+    def build_session(self, workers, retries):
+        """HTTP session with a connection pool sized for the workers and retry with backoff"""
+        session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+        )
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def download(self, session, image_url, timeout):
+        response = session.get(image_url, timeout=timeout)
+        response.raise_for_status()
+        return response.content, response.headers.get('Content-Type', '')
+
+    def store(self, content, content_type):
+        """Save the image under its content hash, skipping content that is already stored"""
+        digest = hashlib.sha256(content).hexdigest()
+        extension = CONTENT_TYPE_EXTENSIONS.get(content_type.split(';')[0].strip(), 'jpg')
+        image_name = f'{IMAGE_STORE_PREFIX}{digest[:2]}/{digest}.{extension}'
+        if not default_storage.exists(image_name):
+            image_name = default_storage.save(image_name, ContentFile(content))
+        return image_name
+
+
+def is_image(content):
+    """True if Pillow recognises `content` as an image it can read"""
+    try:
+        Image.open(BytesIO(content)).verify()
+    except (OSError, SyntaxError, ValueError):
+        return False
+    return True
@@ -0,0 +1,329 @@
+import importlib
+import json
+import platform
+import random
+import secrets
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.urls import clear_url_caches, reverse
+from store import urls as store_urls
+from store.cart import CART_SESSION_KEY
+from store.middleware import QueryRecorder, wrap_connections
+from store.models import Cart, CartItem, Category, Order, OrderLine, Product
+from store.search import get_search_backend
+
+SEED_BATCH_SIZE = 5000
+
+WORDS = (
+    'classic cotton slim fit relaxed denim linen wool silk stretch vintage '
+    'oversized cropped striped graphic organic premium lightweight washed'
+).split()
+GARMENTS = 'T-Shirt Jeans Dress Shirt Hoodie Jacket Blazer Skirt Sweater Chinos'.split()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every storefront route against a seeded synthetic catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help='Products to seed (default: 10000)')
+        parser.add_argument('--categories', type=int, default=12, help='Categories to seed (default: 12)')
+        parser.add_argument('--cart-items', type=int, default=50, help='Items in the benchmark cart (default: 50)')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per route (default: 200)')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per route (default: 10)')
+        parser.add_argument('--routes', nargs='*', help='Only benchmark these route names')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the catalogue and requests')
+        parser.add_argument('--output', default='benchmark.json', help='Where to write the JSON results')
+        parser.add_argument(
+            '--compare-async', action='store_true',
+            help='Also run every route against store.async_views through the async test client',
+        )
+        parser.add_argument(
+            '--conn-max-age', type=int, nargs='+', metavar='SECONDS',
+            help='Also run every route with each of these CONN_MAX_AGE values (0 opens a connection, '
+                 'or takes one from the pool, per request)',
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Reuse (and keep) an existing benchmark database instead of seeding a fresh one',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        verbosity = options['verbosity']
+
+        # Everything runs against a throwaway test database, never the real one
+        old_config = setup_databases(verbosity=max(0, verbosity - 1), interactive=False, keepdb=options['keepdb'])
+        try:
+            with override_settings(ALLOWED_HOSTS=['*'], STORE_PERFORMANCE_ENABLED=False):
+                if not (options['keepdb'] and Product.objects.exists()):
+                    self.seed(options['products'], options['categories'])
+                self.prepare_cart(options['cart_items'])
+                results = self.run_routes(options)
+                async_results = None
+                if options['compare_async']:
+                    with override_settings(STORE_ASYNC_VIEWS=True):
+                        self.reload_urls()
+                        async_results = self.run_routes(options, use_async=True)
+                    self.reload_urls()
+                connection_results = None
+                if options['conn_max_age']:
+                    connection_results = self.compare_connections(options)
+        finally:
+            teardown_databases(old_config, verbosity=max(0, verbosity - 1), keepdb=options['keepdb'])
+
+        report = {
+            'meta': self.metadata(options),
+            'routes': results,
+        }
+        if async_results is not None:
+            report['async_routes'] = async_results
+        if connection_results is not None:
+            report['conn_max_age_routes'] = connection_results
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+
+        self.stdout.write(f'{"route":<28}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}{"queries":>9}')
+        rows = list(results.items())
+        if async_results is not None:
+            rows += [(f'{name} [async]', result) for name, result in async_results.items()]
+        for max_age, mode_results in (connection_results or {}).items():
+            rows += [(f'{name} [age={max_age}]', result) for name, result in mode_results.items()]
+        for name, result in rows:
+            self.stdout.write(
+                f'{name:<28}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+                f'{result["throughput_rps"]:>9.0f}{result["queries_mean"]:>9.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Successfully wrote benchmark results to {options["output"]}!'))
+
+    def metadata(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'timestamp': datetime.now(dt_timezone.utc).isoformat(),
+            'git_commit': commit,
+            'database': connection.vendor,
+            'database_engine': connection.settings_dict['ENGINE'],
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'connection_pool': connection.settings_dict['OPTIONS'].get('pool'),
+            'python': platform.python_version(),
+            'products': Product.objects.count(),
+            'cart_items': options['cart_items'],
+            'requests_per_route': options['requests'],
+            'seed': options['seed'],
+        }
+
+    def seed(self, product_count, category_count):
+        self.stdout.write(f'Seeding {category_count} categories and {product_count} products...')
+        started = time.perf_counter()
+        Category.objects.bulk_create(
+            Category(name=f'Category {i}', slug=f'category-{i}', description='Benchmark category')
+            for i in range(category_count)
+        )
+        category_ids = list(Category.objects.values_list('id', flat=True))
+
+        for start in range(0, product_count, SEED_BATCH_SIZE):
+            batch = []
+            for i in range(start, min(start + SEED_BATCH_SIZE, product_count)):
+                price = Decimal(self.random.randrange(500, 20000)) / 100
+                original_price = price * Decimal('1.25') if i % 3 == 0 else None
+                name = f'{self.random.choice(WORDS).title()} {self.random.choice(WORDS).title()} {self.random.choice(GARMENTS)}'
+                batch.append(Product(
+                    name=name,
+                    slug=f'bench-product-{i}',
+                    description=' '.join(self.random.choices(WORDS, k=20)),
+                    price=price,
+                    original_price=original_price,
+                    discount_percentage=Product.calculate_discount(price, original_price),
+                    category_id=self.random.choice(category_ids),
+                    gender=self.random.choice('MWU'),
+                    stock=1_000_000,
+                    available=i % 20 != 0,
+                ))
+            Product.objects.bulk_create(batch)
+        get_search_backend().rebuild()
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    def prepare_cart(self, cart_items):
+        """Anonymous session with a cart of `cart_items` lines for the cart routes"""
+        cart = Cart.objects.create(session_key=secrets.token_hex(20))
+        session = importlib.import_module(settings.SESSION_ENGINE).SessionStore()
+        session[CART_SESSION_KEY] = cart.session_key
+        session.save()
+        self.session_key = session.session_key
+        product_ids = list(Product.objects.filter(available=True).values_list('id', flat=True)[:cart_items])
+        CartItem.objects.bulk_create(CartItem(cart=cart, product_id=pk, quantity=1) for pk in product_ids)
+        Cart.objects.filter(pk=cart.pk).rebuild_totals()
+        self.cart = cart
+        self.order = self.prepare_order(product_ids)
+        self.sample_ids = list(
+            Product.objects.filter(available=True).order_by('?').values_list('id', flat=True)[:500]
+        )
+        self.sample_slugs = list(Product.objects.filter(pk__in=self.sample_ids).values_list('slug', flat=True))
+        self.category_slugs = list(Category.objects.values_list('slug', flat=True))
+        self.category_ids = list(Category.objects.values_list('id', flat=True))
+
+    def prepare_order(self, product_ids):
+        """Placed order with a line per cart item, for the order confirmation route"""
+        products = list(Product.objects.filter(pk__in=product_ids))
+        order = Order.objects.create(
+            first_name='Bench', last_name='Mark', email='bench@example.com', phone='555-0100',
+            address='1 Benchmark Way', city='Testville', state='TS', zip_code='00000',
+            total_items=len(products), total_price=sum((product.price for product in products), Decimal('0.00')),
+        )
+        OrderLine.objects.bulk_create(
+            OrderLine(order=order, product=product, product_name=product.name, price=product.price, quantity=1)
+            for product in products
+        )
+        return order
+
+    def reload_urls(self):
+        """Re-import the URLconfs so store.urls picks views for the current STORE_ASYNC_VIEWS"""
+        importlib.reload(store_urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    def compare_connections(self, options):
+        """Route results per CONN_MAX_AGE value, keyed by the value"""
+        settings_dict = connections['default'].settings_dict
+        configured = settings_dict['CONN_MAX_AGE']
+        results = {}
+        try:
+            for max_age in options['conn_max_age']:
+                # The age applies from the next connection on
+                settings_dict['CONN_MAX_AGE'] = max_age
+                connections['default'].close()
+                results[str(max_age)] = self.run_routes(options, label=f'age={max_age}')
+        finally:
+            settings_dict['CONN_MAX_AGE'] = configured
+            connections['default'].close()
+        return results
+
+    def route_plan(self, client_class):
+        """route name -> (client, request builder); builders return (method, url, data)"""
+        browse = client_class()
+        cart = client_class()
+        cart.cookies[settings.SESSION_COOKIE_NAME] = self.session_key
+        cart_line = lambda: CartItem.objects.filter(cart=self.cart).order_by('?').values_list('id', flat=True).first()
+
+        def removable_line():
+            # Put a line back first so every timed removal deletes a real row
+            product_id = self.random.choice(self.sample_ids)
+            line, _ = CartItem.objects.get_or_create(cart=self.cart, product_id=product_id)
+            return line.id
+
+        return {
+            'home': (browse, lambda: ('get', reverse('store:home'), None)),
+            'product_list': (browse, lambda: ('get', reverse('store:product_list'), None)),
+            'product_list:category': (browse, lambda: (
+                'get', reverse('store:product_list'),
+                {'category': self.random.choice(self.category_slugs), 'sort': 'price_low'},
+            )),
+            'product_list:search': (browse, lambda: (
+                'get', reverse('store:product_list'), {'search': self.random.choice(WORDS)},
+            )),
+            'product_detail': (browse, lambda: (
+                'get', reverse('store:product_detail', args=[self.random.choice(self.sample_slugs)]), None,
+            )),
+            'placeholder': (browse, lambda: (
+                'get', reverse('store:placeholder', args=[self.random.choice(self.category_ids)]), {'t': 'Bench'},
+            )),
+            'cart': (cart, lambda: ('get', reverse('store:cart'), None)),
+            'cart_summary': (cart, lambda: ('get', reverse('store:cart_summary'), None)),
+            'checkout': (cart, lambda: ('get', reverse('store:checkout'), None)),
+            'order_confirmation': (cart, lambda: (
+                'get', reverse('store:order_confirmation', args=[self.order.reference]), None,
+            )),
+            'add_to_cart': (cart, lambda: (
+                'post', reverse('store:add_to_cart', args=[self.random.choice(self.sample_ids)]), {'quantity': 1},
+            )),
+            'update_cart_quantity': (cart, lambda: (
+                'post', reverse('store:update_cart_quantity', args=[cart_line()]),
+                {'quantity': self.random.randint(1, 5)},
+            )),
+            'remove_from_cart': (cart, lambda: (
+                'post', reverse('store:remove_from_cart', args=[removable_line()]), None,
+            )),
+        }
+
+    def run_routes(self, options, use_async=False, label=None):
+        plan = self.route_plan(AsyncClient if use_async else Client)
+        covered = {name.split(':')[0] for name in plan}
+        for pattern in store_urls.urlpatterns:
+            if pattern.name not in covered:
+                self.stdout.write(self.style.WARNING(f'Route not benchmarked: {pattern.name}'))
+
+        if use_async:
+            label = 'async'
+        results = {}
+        for name, (client, build) in plan.items():
+            if options['routes'] and name not in options['routes'] and name.split(':')[0] not in options['routes']:
+                continue
+            for _ in range(options['warmup']):
+                self.request(client, *build())
+            results[name] = self.measure(client, build, options['requests'])
+            self.stdout.write(f'Benchmarked {name}{f" [{label}]" if label else ""}')
+        return results
+
+    def request(self, client, method, url, data):
+        headers = {'X-Requested-With': 'XMLHttpRequest'} if method == 'post' else {}
+        if isinstance(client, AsyncClient):
+            async def send():
+                return await getattr(client, method)(url, data or {}, headers=headers)
+            return async_to_sync(send)()
+        return getattr(client, method)(url, data or {}, headers=headers)
+
+    def measure(self, client, build, count):
+        timings = []
+        queries = []
+        statuses = {}
+        started = time.perf_counter()
+        for _ in range(count):
+            # Builders may query (to pick a cart line), so they run before the clock starts
+            method, url, data = build()
+            # Like a server at the start of a request, drop (or return to the pool) connections
+            # that have reached CONN_MAX_AGE; the test client skips this
+            close_old_connections()
+            recorder = QueryRecorder()
+            with ExitStack() as stack:
+                wrap_connections(stack, recorder)
+                request_started = time.perf_counter()
+                response = self.request(client, method, url, data)
+                timings.append((time.perf_counter() - request_started) * 1000)
+            queries.append(recorder.count)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        elapsed = time.perf_counter() - started
+
+        timings.sort()
+        return {
+            'requests': count,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3) if timings else 0.0,
+            'throughput_rps': round(count / elapsed, 1) if elapsed else 0.0,
+            'queries_mean': round(statistics.fmean(queries), 2) if queries else 0.0,
+            'queries_max': max(queries, default=0),
+            'statuses': {str(status): n for status, n in sorted(statuses.items())},
+        }
@@ -0,0 +1,167 @@
+import itertools
+import random
+import time
+
+import numpy as np
+from scipy import sparse
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import setup_databases, teardown_databases
+from store import cache
+from store.models import Cart, CartItem, Category, Product, ProductRecommendation
+
+READ_CHUNK_SIZE = 20000
+WRITE_BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "frequently carted together" recommendations from cart contents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=8, help='Recommendations kept per product (default: 8)')
+        parser.add_argument(
+            '--min-carts', type=int, default=2,
+            help='Carts two products must share before one is recommended for the other (default: 2)',
+        )
+        parser.add_argument(
+            '--benchmark', type=int, metavar='CART_ITEMS',
+            help='Time a rebuild over this many synthetic cart items in a throwaway test database',
+        )
+        parser.add_argument('--products', type=int, default=10000, help='Products to seed for --benchmark')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for --benchmark')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self.benchmark(options)
+        timings = self.rebuild(options['top_k'], options['min_carts'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully stored {timings["recommendations"]} recommendations '
+            f'for {timings["products"]} products in {timings["total"]:.1f}s!'
+        ))
+
+    def rebuild(self, top_k, min_carts):
+        """Recompute every product's neighbours; returns counts and per-phase timings"""
+        timings = {}
+        started = time.perf_counter()
+
+        cart_ids, product_ids = self.load_cart_items()
+        timings['load'] = time.perf_counter() - started
+
+        phase = time.perf_counter()
+        products, cooccurrence = self.cooccurrence(cart_ids, product_ids)
+        timings['matrix'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        rows = list(self.neighbours(products, cooccurrence, top_k, min_carts))
+        timings['top_k'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        self.store(rows)
+        timings['write'] = time.perf_counter() - phase
+
+        timings['total'] = time.perf_counter() - started
+        timings['products'] = len({row.product_id for row in rows})
+        timings['recommendations'] = len(rows)
+        return timings
+
+    def load_cart_items(self):
+        """(cart_ids, product_ids) arrays with one entry per cart line"""
+        pairs = CartItem.objects.order_by().values_list('cart_id', 'product_id').iterator(chunk_size=READ_CHUNK_SIZE)
+        flat = np.fromiter(itertools.chain.from_iterable(pairs), dtype=np.int64)
+        return flat[0::2], flat[1::2]
+
+    def cooccurrence(self, cart_ids, product_ids):
+        """Product ids and the product x product matrix of how many carts hold both
+
+        The diagonal holds the number of carts each product is in.
+        """
+        carts = np.unique(cart_ids, return_inverse=True)[1]
+        products, columns = np.unique(product_ids, return_inverse=True)
+        # Carts x products incidence matrix; a cart holds each product at most once
+        incidence = sparse.csr_matrix(
+            (np.ones(len(columns), dtype=np.int32), (carts, columns)),
+            shape=(carts.max() + 1 if len(carts) else 0, len(products)),
+        )
+        return products, (incidence.T @ incidence).tocsr()
+
+    def neighbours(self, products, cooccurrence, top_k, min_carts):
+        """Unsaved ProductRecommendation rows, ranked by cosine similarity
+
+        Raw co-occurrence counts would recommend the best sellers for every
+        product, so each count is scaled by how many carts the two products are
+        in: count / sqrt(carts(a) * carts(b)).
+        """
+        cart_counts = cooccurrence.diagonal().astype(np.float64)
+        indptr, indices, counts = cooccurrence.indptr, cooccurrence.indices, cooccurrence.data
+        product_ids = products.tolist()
+        for row in range(cooccurrence.shape[0]):
+            start, end = indptr[row], indptr[row + 1]
+            columns, shared = indices[start:end], counts[start:end]
+            keep = (columns != row) & (shared >= min_carts)
+            columns, shared = columns[keep], shared[keep]
+            if not len(columns):
+                continue
+            scores = shared / np.sqrt(cart_counts[row] * cart_counts[columns])
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                best = np.arange(len(scores))
+            best = best[np.argsort(-scores[best], kind='stable')]
+            for rank, column in enumerate(best.tolist()):
+                yield ProductRecommendation(
+                    product_id=product_ids[row],
+                    recommended_id=product_ids[columns[column]],
+                    rank=rank,
+                    score=float(scores[column]),
+                )
+
+    def store(self, rows):
+        """Swap in the new recommendations; readers see either the old set or the new one"""
+        with transaction.atomic():
+            ProductRecommendation.objects.all().delete()
+            ProductRecommendation.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+            # Product pages are cached with the related products they showed
+            transaction.on_commit(lambda: cache.bump_version(cache.PRODUCTS))
+
+    def benchmark(self, options):
+        verbosity = options['verbosity']
+        old_config = setup_databases(verbosity=max(0, verbosity - 1), interactive=False)
+        try:
+            self.seed(options['benchmark'], options['products'], random.Random(options['seed']))
+            timings = self.rebuild(options['top_k'], options['min_carts'])
+        finally:
+            teardown_databases(old_config, verbosity=max(0, verbosity - 1))
+
+        for phase in ('load', 'matrix', 'top_k', 'write', 'total'):
+            self.stdout.write(f'{phase:<8}{timings[phase]:>9.2f}s')
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully rebuilt {timings["recommendations"]} recommendations '
+            f'from {options["benchmark"]} cart items!'
+        ))
+
+    def seed(self, item_count, product_count, rng):
+        """Carts of 1-10 lines drawn from a catalogue with a long tail of popularity"""
+        self.stdout.write(f'Seeding {item_count} cart items over {product_count} products...')
+        category = Category.objects.create(name='Benchmark', slug='benchmark')
+        Product.objects.bulk_create(
+            (
+                Product(name=f'Product {i}', slug=f'bench-product-{i}', description='', price=10, category=category)
+                for i in range(product_count)
+            ),
+            batch_size=WRITE_BATCH_SIZE,
+        )
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        # Zipf-like weights, so some products are in many carts and most in few
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(product_ids))))
+
+        remaining = item_count
+        while remaining > 0:
+            carts = Cart.objects.bulk_create(Cart() for _ in range(min(WRITE_BATCH_SIZE, remaining)))
+            items = []
+            for cart in carts:
+                if remaining <= 0:
+                    break
+                lines = set(rng.choices(product_ids, cum_weights=cum_weights, k=min(rng.randint(1, 10), remaining)))
+                items += [CartItem(cart_id=cart.id, product_id=product_id) for product_id in lines]
+                remaining -= len(lines)
+            CartItem.objects.bulk_create(items, batch_size=WRITE_BATCH_SIZE)
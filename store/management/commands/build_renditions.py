@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from store.images import generate_renditions
+from store.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = 'Generate missing image renditions for every product and category image'
+
+    def handle(self, *args, **options):
+        # Images shared by several products are resized once
+        names = sorted(
+            set(Product.objects.filter(image__gt='').values_list('image', flat=True))
+            | set(Category.objects.filter(image__gt='').values_list('image', flat=True))
+        )
+        self.stdout.write(f'Generating renditions for {len(names)} images...')
+
+        failed = 0
+        for name in names:
+            if not generate_renditions(name):
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Could not resize: {name}'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully generated renditions for {len(names) - failed} images!')
+        )
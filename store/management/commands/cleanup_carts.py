@@ -0,0 +1,71 @@
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from store.models import Cart
+
+DELETE_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions and abandoned carts in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--anonymous-age', type=int, default=settings.SESSION_COOKIE_AGE,
+            help='Seconds after its last change that an anonymous cart is abandoned '
+                 '(default: SESSION_COOKIE_AGE, after which its session is gone)',
+        )
+        parser.add_argument(
+            '--empty-age', type=int, default=24 * 60 * 60,
+            help='Seconds after its last change that an empty cart is deleted (default: 1 day)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DELETE_BATCH_SIZE,
+            help=f'Rows deleted per statement (default: {DELETE_BATCH_SIZE})',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted')
+
+    def handle(self, *args, **options):
+        self.batch_size = max(1, options['batch_size'])
+        self.dry_run = options['dry_run']
+        now = timezone.now()
+
+        sessions = self.clear_sessions(now)
+
+        # Anonymous carts outlive the sessions that point at them, and empty carts
+        # are recreated on the next add to cart anyway
+        stale = Cart.objects.filter(
+            Q(user__isnull=True, updated_at__lt=now - timedelta(seconds=options['anonymous_age'])) |
+            Q(total_items=0, updated_at__lt=now - timedelta(seconds=options['empty_age']))
+        )
+        carts = self.delete_in_batches(stale)
+
+        verb = 'Would delete' if self.dry_run else 'Successfully deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {sessions} expired sessions and {carts} carts!'))
+
+    def clear_sessions(self, now):
+        """Delete expired database sessions; other engines expire their own"""
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(store, 'get_model_class'):
+            if not self.dry_run:
+                store.clear_expired()
+            return 0
+        return self.delete_in_batches(store.get_model_class().objects.filter(expire_date__lt=now))
+
+    def delete_in_batches(self, queryset):
+        """Delete matching rows a batch of primary keys at a time, keeping each transaction short"""
+        if self.dry_run:
+            return queryset.count()
+        model = queryset.model
+        deleted = 0
+        while True:
+            batch = list(queryset.order_by().values_list('pk', flat=True)[:self.batch_size])
+            if not batch:
+                return deleted
+            # Cart items are removed with their carts by the deletion collector's cascade
+            _, per_model = model.objects.filter(pk__in=batch).delete()
+            deleted += per_model.get(model._meta.label, 0)
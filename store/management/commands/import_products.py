@@ -0,0 +1,198 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from store import cache
+from store.cart import reprice_carts
+from store.models import Category, Product
+from store.search import get_search_backend
+
+# Product columns overwritten when a row's slug already exists. The image is
+# only overwritten by rows that have one, so a feed without images keeps them.
+UPDATE_FIELDS = [
+    'name', 'description', 'price', 'original_price', 'category', 'gender',
+    'stock', 'available', 'discount_percentage', 'updated_at',
+]
+
+GENDERS = {choice for choice, _ in Product.GENDER_CHOICES}
+
+# Largest values the price (max_digits=10, decimal_places=2) and stock columns hold
+MAX_PRICE = Decimal('99999999.99')
+MAX_STOCK = 2147483647
+
+# Lengths feed values must fit, since on PostgreSQL one value too long fails the whole batch
+PRODUCT_MAX_LENGTHS = {field: Product._meta.get_field(field).max_length for field in ('name', 'slug', 'image')}
+CATEGORY_MAX_LENGTHS = {field: Category._meta.get_field(field).max_length for field in ('name', 'slug')}
+
+
+class Command(BaseCommand):
+    help = 'Import or update products in bulk from a CSV or JSON Lines feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or a .jsonl file')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Feed format (default: guessed from the file extension)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows written per transaction (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'File not found: {path}')
+        feed_format = options['format'] or ('jsonl' if path.suffix in ('.jsonl', '.ndjson') else 'csv')
+        batch_size = max(1, options['batch_size'])
+
+        # Categories are resolved once up front and only new ones are created per batch
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+        self.search_backend = get_search_backend()
+
+        self.stdout.write(f'Importing products from {path}...')
+        imported = skipped = batches = 0
+        started = time.perf_counter()
+
+        with path.open(newline='', encoding='utf-8') as feed:
+            rows = self.read_rows(feed, feed_format)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                batch_started = time.perf_counter()
+                written, rejected = self.import_batch(batch)
+                imported += written
+                skipped += rejected
+                batches += 1
+                elapsed = time.perf_counter() - batch_started
+                self.stdout.write(
+                    f'Batch {batches}: {written} rows in {elapsed:.2f}s '
+                    f'({written / elapsed if elapsed else 0:.0f} rows/sec)'
+                )
+
+        cache.bump_version(cache.CATEGORIES)
+        cache.bump_version(cache.PRODUCTS)
+
+        elapsed = time.perf_counter() - started
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped} invalid rows'))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully imported {imported} products in {elapsed:.2f}s '
+                f'({imported / elapsed if elapsed else 0:.0f} rows/sec)!'
+            )
+        )
+
+    def read_rows(self, feed, feed_format):
+        if feed_format == 'jsonl':
+            for line in feed:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Counted as a skipped row like any other invalid one
+                        yield None
+        else:
+            yield from csv.DictReader(feed)
+
+    def import_batch(self, rows):
+        """Upsert one batch of rows by slug; returns (written, skipped)"""
+        products = {}
+        skipped = 0
+        self.create_categories(rows)
+        for row in rows:
+            product = self.build_product(row)
+            if product is None:
+                skipped += 1
+                continue
+            # A slug repeated within a batch can only be upserted once; the last row wins
+            products[product.slug] = product
+
+        with_image = [product for product in products.values() if product.image]
+        without_image = [product for product in products.values() if not product.image]
+        with transaction.atomic():
+            old_prices = dict(Product.objects.filter(slug__in=products.keys()).values_list('slug', 'price'))
+            for batch, update_fields in ((with_image, [*UPDATE_FIELDS, 'image']), (without_image, UPDATE_FIELDS)):
+                if batch:
+                    Product.objects.bulk_create(
+                        batch,
+                        update_conflicts=True,
+                        unique_fields=['slug'],
+                        update_fields=update_fields,
+                    )
+            # bulk_create bypasses the post_save signal, so index the batch here
+            self.search_backend.index_products(Product.objects.filter(slug__in=products.keys()))
+            # and rebuild the stored totals of carts holding a repriced product
+            repriced = [slug for slug, price in old_prices.items() if products[slug].price != price]
+            if repriced:
+                reprice_carts(Product.objects.filter(slug__in=repriced).values('pk'))
+        return len(products), skipped
+
+    def create_categories(self, rows):
+        missing = {}
+        for row in rows:
+            if not isinstance(row, dict) or not isinstance(row.get('category'), str):
+                continue
+            slug = row['category'].strip()
+            if not slug or slug in self.categories or len(slug) > CATEGORY_MAX_LENGTHS['slug']:
+                continue
+            name = str(row.get('category_name') or '').strip() or slug.replace('-', ' ').title()
+            missing[slug] = Category(slug=slug, name=name[:CATEGORY_MAX_LENGTHS['name']])
+        if missing:
+            Category.objects.bulk_create(missing.values(), ignore_conflicts=True)
+            self.categories.update(
+                Category.objects.filter(slug__in=missing.keys()).values_list('slug', 'id')
+            )
+
+    def build_product(self, row):
+        try:
+            category_id = self.categories[(row.get('category') or '').strip()]
+            original_price = row.get('original_price')
+            gender = (row.get('gender') or 'U').strip().upper()
+            available = row.get('available', True)
+            if isinstance(available, str):
+                available = available.strip().lower() not in ('0', 'false', 'no', '')
+            product = Product(
+                name=row['name'].strip(),
+                slug=row['slug'].strip(),
+                description=row.get('description') or '',
+                price=parse_price(row['price']),
+                original_price=parse_price(original_price) if original_price not in (None, '') else None,
+                category_id=category_id,
+                gender=gender if gender in GENDERS else 'U',
+                stock=parse_stock(row.get('stock') or 0),
+                available=bool(available),
+                image=row.get('image') or '',
+            )
+        except (KeyError, AttributeError, InvalidOperation, ValueError, TypeError):
+            return None
+        if not product.name or not product.slug:
+            return None
+        values = {'name': product.name, 'slug': product.slug, 'image': product.image.name}
+        if any(len(values[field]) > max_length for field, max_length in PRODUCT_MAX_LENGTHS.items()):
+            return None
+        # bulk_create skips Product.save(), which normally derives the discount
+        product.discount_percentage = Product.calculate_discount(product.price, product.original_price)
+        return product
+
+
+def parse_price(value):
+    """Decimal price that fits the price columns; ValueError otherwise"""
+    price = Decimal(str(value).strip())
+    if not price.is_finite() or not 0 <= price <= MAX_PRICE:
+        raise ValueError(f'Price out of range: {value!r}')
+    return price
+
+
+def parse_stock(value):
+    """Stock count that fits the stock column; ValueError if negative or too large"""
+    stock = int(value)
+    if not 0 <= stock <= MAX_STOCK:
+        raise ValueError(f'Stock out of range: {value!r}')
+    return stock
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from store.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored item count and subtotal of carts from their items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'cart_ids', nargs='*', type=int,
+            help='Only rebuild these carts (default: all carts)',
+        )
+
+    def handle(self, *args, **options):
+        carts = Cart.objects.all()
+        if options['cart_ids']:
+            carts = carts.filter(pk__in=options['cart_ids'])
+
+        self.stdout.write('Rebuilding cart totals...')
+        updated = carts.rebuild_totals()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt totals for {updated} carts!')
+        )
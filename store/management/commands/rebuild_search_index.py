@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from store.models import Product
+from store.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding search index with {type(backend).__name__}...')
+
+        backend.rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully indexed {Product.objects.count()} products!')
+        )
@@ -0,0 +1,257 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .routers import get_replicas, pin_to_primary, unpin
+
+logger = logging.getLogger('store.performance')
+
+# Seconds spent rendering templates in the current request, when it is being measured
+_template_time = ContextVar('store_template_time', default=None)
+
+_IN_LIST_RE = re.compile(r'\((?:%s,\s*)+%s\)')
+
+
+def _instrument_template_rendering():
+    """Wrap the Django template backend so render time is added to the measured request"""
+    if getattr(Template.render, 'store_instrumented', False):
+        return
+    render = Template.render
+
+    def timed_render(self, context=None, request=None):
+        timer = _template_time.get()
+        if timer is None:
+            return render(self, context, request)
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            timer[0] += time.perf_counter() - start
+
+    timed_render.store_instrumented = True
+    Template.render = timed_render
+
+
+def wrap_connections(stack, recorder):
+    """Route every query on this thread's connections through `recorder` until `stack` closes"""
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+
+
+class QueryRecorder:
+    """connection.execute_wrapper hook counting queries, their time and repeated shapes"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            # Parameters are passed separately, so the SQL text is already the query
+            # shape; only IN lists of different lengths need folding together
+            self.shapes[_IN_LIST_RE.sub('(...)', sql)] += 1
+
+    def repeated_shapes(self, threshold):
+        return [(sql, count) for sql, count in self.shapes.most_common() if count >= threshold]
+
+
+class PerformanceMiddleware:
+    """Measure wall time, SQL and template time per request
+
+    Results go out as a Server-Timing header and a structured log line on the
+    ``store.performance`` logger, which also warns when one query shape runs
+    STORE_PERFORMANCE_N_PLUS_ONE_THRESHOLD or more times in a request (the
+    signature of an N+1 loop). STORE_PERFORMANCE_SAMPLE_RATE measures only a
+    fraction of requests, for production.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.enabled = getattr(settings, 'STORE_PERFORMANCE_ENABLED', False)
+        self.sample_rate = getattr(settings, 'STORE_PERFORMANCE_SAMPLE_RATE', 1.0)
+        self.n_plus_one_threshold = getattr(settings, 'STORE_PERFORMANCE_N_PLUS_ONE_THRESHOLD', 5)
+        if self.enabled:
+            _instrument_template_rendering()
+
+    def sampled(self):
+        return self.enabled and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        template_timer = [0.0]
+        token = _template_time.set(template_timer)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                wrap_connections(stack, recorder)
+                response = self.get_response(request)
+        finally:
+            _template_time.reset(token)
+        return self.report(request, response, recorder, template_timer[0], time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        template_timer = [0.0]
+        token = _template_time.set(template_timer)
+        start = time.perf_counter()
+        stack = ExitStack()
+        try:
+            # Connections belong to the thread that runs the request's sync code,
+            # so the wrappers are installed and removed from that thread
+            await sync_to_async(wrap_connections)(stack, recorder)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _template_time.reset(token)
+        return self.report(request, response, recorder, template_timer[0], time.perf_counter() - start)
+
+    def report(self, request, response, recorder, template_time, total):
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'tpl;dur={template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 1),
+            'db_queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 1),
+            'template_ms': round(template_time * 1000, 1),
+        }
+        logger.info(json.dumps(record), extra={'performance': record})
+
+        for sql, count in recorder.repeated_shapes(self.n_plus_one_threshold):
+            logger.warning(
+                json.dumps({'event': 'n_plus_one', 'path': request.path, 'count': count, 'sql': sql}),
+                extra={'performance': record},
+            )
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """Keep a request's catalog reads on the primary database when it needs its own writes
+
+    Unsafe requests (POST and friends) are pinned, and their response sets a
+    short-lived cookie that pins the visitor's following requests too, such as
+    the page a form redirects to, until STORE_REPLICA_PIN_SECONDS have passed
+    and the replicas have caught up. Unused without STORE_DATABASE_REPLICAS.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    cookie_name = 'store_primary'
+
+    def __init__(self, get_response):
+        if not get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.pin_seconds = getattr(settings, 'STORE_REPLICA_PIN_SECONDS', 5)
+
+    def is_unsafe(self, request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def needs_primary(self, request):
+        return self.is_unsafe(request) or self.cookie_name in request.COOKIES
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.needs_primary(request):
+            return self.get_response(request)
+        token = pin_to_primary()
+        try:
+            response = self.get_response(request)
+        finally:
+            unpin(token)
+        return self.set_pin_cookie(request, response)
+
+    async def __acall__(self, request):
+        if not self.needs_primary(request):
+            return await self.get_response(request)
+        # The sync code of the request runs with a copy of this context, pin included
+        token = pin_to_primary()
+        try:
+            response = await self.get_response(request)
+        finally:
+            unpin(token)
+        return self.set_pin_cookie(request, response)
+
+    def set_pin_cookie(self, request, response):
+        if self.is_unsafe(request):
+            response.set_cookie(self.cookie_name, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that also runs natively under ASGI
+
+    WhiteNoise 6.6 is sync-only, which would force every request through a
+    thread hop in an otherwise async middleware stack. Static files are looked
+    up the same way; everything else goes straight to the next async handler.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
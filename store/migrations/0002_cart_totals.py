@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2025-08-02 10:14
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    Cart.objects.update(
+        total_items=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), 0),
+        total_price=Coalesce(
+            Subquery(
+                items.annotate(
+                    total=Sum(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+                ).values('total')
+            ),
+            Decimal('0.00'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.RunPython(populate_cart_totals, migrations.RunPython.noop),
+    ]
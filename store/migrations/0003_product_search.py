@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2025-08-03 09:21
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX store_product_search_vector_idx ON store_product USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            "UPDATE store_product p SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(p.name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(c.name, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(p.description, '')), 'C') "
+            "FROM store_category c WHERE c.id = p.category_id"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE store_product_fts USING fts5("
+            "name, description, category, tokenize = 'porter unicode61')"
+        )
+        schema_editor.execute(
+            'INSERT INTO store_product_fts (rowid, name, description, category) '
+            'SELECT p.id, p.name, p.description, c.name '
+            'FROM store_product p JOIN store_category c ON c.id = p.category_id'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS store_product_search_vector_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS store_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_cart_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
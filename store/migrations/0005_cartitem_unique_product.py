@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2025-08-05 14:37
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    """Fold duplicate (cart, product) lines left by racing adds into one line each"""
+    CartItem = apps.get_model('store', 'CartItem')
+    duplicates = (
+        CartItem.objects.values('cart', 'product')
+        .annotate(lines=Count('id'), keep=Min('id'), quantity=Sum('quantity'))
+        .filter(lines__gt=1)
+    )
+    for duplicate in duplicates:
+        CartItem.objects.filter(pk=duplicate['keep']).update(quantity=duplicate['quantity'])
+        CartItem.objects.filter(
+            cart=duplicate['cart'], product=duplicate['product']
+        ).exclude(pk=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_storefront_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='cartitem',
+            name='cartitem_cart_product_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='cartitem_unique_cart_product'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2025-08-07 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_cartitem_unique_product'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, upload_to='products/'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2025-08-08 11:02
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Floor
+
+
+def populate_discount_percentage(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Product.objects.filter(original_price__gt=F('price')).update(
+        discount_percentage=Floor(
+            (F('original_price') - F('price')) * 100 / F('original_price'),
+            output_field=models.PositiveSmallIntegerField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_product_image_optional'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='discount_percentage',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_discount_percentage, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available', True)), fields=['discount_percentage', 'id'], name='prod_avail_discount_idx'),
+        ),
+    ]
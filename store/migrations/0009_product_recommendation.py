@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='store.product')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_in', to='store.product')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productrecommendation',
+            constraint=models.UniqueConstraint(fields=('product', 'rank'), name='productrec_unique_product_rank'),
+        ),
+    ]
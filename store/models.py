@@ -1,5 +1,12 @@
+import secrets
+from decimal import Decimal
+
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -15,6 +22,13 @@ class Category(models.Model):
         return self.name
 
 
+class ProductManager(models.Manager):
+    def get_queryset(self):
+        # The search vector is only ever used inside the database, so it stays out of
+        # the rows that listings, product pages and cached payloads fetch
+        return super().get_queryset().defer('search_vector')
+
+
 class Product(models.Model):
     GENDER_CHOICES = [
         ('M', 'Men'),
@@ -29,38 +43,98 @@ class Product(models.Model):
     original_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, default='U')
-    image = models.ImageField(upload_to='products/')
+    image = models.ImageField(upload_to='products/', blank=True)
     stock = models.PositiveIntegerField(default=0)
     available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Derived from price and original_price on save so sale filters and sorts run in SQL
+    discount_percentage = models.PositiveSmallIntegerField(default=0, editable=False)
+    
+    objects = ProductManager()
+    
+    class Meta:
+        # The storefront only ever lists available products, so these are partial
+        # indexes matching its filters and its sort orders (which all end in id)
+        indexes = [
+            models.Index(fields=['name', 'id'], condition=Q(available=True), name='prod_avail_name_idx'),
+            models.Index(fields=['price', 'id'], condition=Q(available=True), name='prod_avail_price_idx'),
+            models.Index(fields=['created_at', 'id'], condition=Q(available=True), name='prod_avail_created_idx'),
+            models.Index(fields=['category', 'name', 'id'], condition=Q(available=True), name='prod_avail_cat_name_idx'),
+            models.Index(fields=['gender', 'name', 'id'], condition=Q(available=True), name='prod_avail_gender_name_idx'),
+            models.Index(fields=['discount_percentage', 'id'], condition=Q(available=True), name='prod_avail_discount_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
     @property
-    def discount_percentage(self):
-        if self.original_price and self.original_price > self.price:
-            return int(((self.original_price - self.price) / self.original_price) * 100)
+    def placeholder_url(self):
+        """Generated stand-in image used while the product has no photo"""
+        from .cache import get_menu_categories
+        from .placeholders import placeholder_url
+        # The slug goes in the URL rather than the id, so re-slugging a category moves
+        # its placeholders to new URLs instead of changing the image behind the old ones
+        category_slugs = {category.id: category.slug for category in get_menu_categories()}
+        return placeholder_url(category_slugs.get(self.category_id), self.name)
+    
+    def save(self, *args, **kwargs):
+        self.discount_percentage = self.calculate_discount(self.price, self.original_price)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'price', 'original_price'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'discount_percentage'}
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def calculate_discount(price, original_price):
+        """Whole percentage off the original price, rounded down"""
+        if original_price and original_price > price:
+            return int(((original_price - price) / original_price) * 100)
         return 0
 
 
+class CartQuerySet(models.QuerySet):
+    def rebuild_totals(self):
+        """Recompute the stored totals from the cart items in a single UPDATE"""
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        return self.update(
+            total_items=Coalesce(
+                Subquery(items.annotate(total=Sum('quantity')).values('total')),
+                0,
+            ),
+            total_price=Coalesce(
+                Subquery(
+                    items.annotate(
+                        total=Sum(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+                    ).values('total')
+                ),
+                Decimal('0.00'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    session_key = models.CharField(max_length=40, null=True, blank=True)
+    session_key = models.CharField(max_length=40, null=True, blank=True, db_index=True)
+    total_items = models.PositiveIntegerField(default=0, editable=False)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CartQuerySet.as_manager()
+    
     def __str__(self):
         return f"Cart {self.id}"
     
-    @property
-    def total_price(self):
-        return sum(item.total_price for item in self.items.all())
-    
-    @property
-    def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+    def adjust_totals(self, quantity, amount):
+        """Atomically shift the stored totals by a quantity and price delta"""
+        Cart.objects.filter(pk=self.pk).update(
+            total_items=F('total_items') + quantity,
+            total_price=F('total_price') + amount,
+            updated_at=timezone.now(),
+        )
 
 
 class CartItem(models.Model):
@@ -69,9 +143,71 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='cartitem_unique_cart_product'),
+        ]
+    
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
     
     @property
     def total_price(self):
-        return self.product.price * self.quantity 
\ No newline at end of file
+        return self.product.price * self.quantity
+
+
+def new_order_reference():
+    """Random order number, also used in the confirmation URL so it can't be guessed"""
+    return secrets.token_hex(8).upper()
+
+
+class Order(models.Model):
+    reference = models.CharField(max_length=16, unique=True, default=new_order_reference, editable=False)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    first_name = models.CharField(max_length=100)
+    last_name = models.CharField(max_length=100)
+    email = models.EmailField()
+    phone = models.CharField(max_length=30)
+    address = models.CharField(max_length=255)
+    city = models.CharField(max_length=100)
+    state = models.CharField(max_length=100)
+    zip_code = models.CharField(max_length=20)
+    total_items = models.PositiveIntegerField(default=0)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Order {self.reference}"
+
+
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+    # Name and price are copied from the product, so the order reads the same after it changes
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    product_name = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+    
+    @property
+    def total_price(self):
+        return self.price * self.quantity
+
+
+class ProductRecommendation(models.Model):
+    """A product frequently carted together with another, rebuilt by build_recommendations"""
+    # Indexed through the (product, rank) constraint, which serves the lookup in rank order
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations', db_index=False)
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_in')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='productrec_unique_product_rank'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} (#{self.rank})"
@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+
+from . import cache
+from .cart import InsufficientStock
+from .models import Cart, CartItem, Order, OrderLine, Product
+
+
+class EmptyCart(Exception):
+    """Raised when placing an order for a cart that is empty or already ordered"""
+
+
+def _take_stock(quantities):
+    """Subtract each product's quantity from its stock in one UPDATE
+
+    Returns False, with no stock taken, unless every product had enough.
+    """
+    enough = Q()
+    for product_id, quantity in quantities.items():
+        enough |= Q(pk=product_id, stock__gte=quantity)
+    with transaction.atomic():
+        # The stock condition is checked again on the current row as each one is updated,
+        # so concurrent orders queue on the rows they share instead of overselling
+        updated = Product.objects.filter(enough, available=True).update(stock=Case(
+            *[When(pk=product_id, then=F('stock') - quantity) for product_id, quantity in quantities.items()],
+            output_field=PositiveIntegerField(),
+        ), updated_at=timezone.now())
+        if updated != len(quantities):
+            # Put back what the other lines took, so the short product can be told apart
+            transaction.set_rollback(True)
+    return updated == len(quantities)
+
+
+def place_order(cart, user=None, **details):
+    """Turn a cart into an order, taking its items out of stock
+
+    The cart's lines are copied into OrderLine rows at the current prices with
+    one bulk_create. Stock for every line comes off in a single conditional
+    UPDATE rather than locking each product first. If any product no longer has
+    enough (or was withdrawn), the transaction rolls back and InsufficientStock
+    names the first such product. The cart is deleted with the order in place.
+    """
+    with transaction.atomic():
+        # Claim the cart before reading it: a second checkout of the same cart waits
+        # here and then finds it gone, and SQLite takes its write lock up front
+        if not Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now()):
+            raise EmptyCart(cart)
+        items = list(
+            CartItem.objects.filter(cart=cart)
+            .select_related('product')
+            .defer('product__search_vector')
+            .order_by('created_at', 'id')
+        )
+        if not items:
+            raise EmptyCart(cart)
+
+        quantities = {item.product_id: item.quantity for item in items}
+        if not _take_stock(quantities):
+            short = [
+                product for product in Product.objects.filter(pk__in=quantities).order_by('pk')
+                if not product.available or product.stock < quantities[product.pk]
+            ]
+            raise InsufficientStock(short[0] if short else items[0].product)
+
+        order = Order.objects.create(
+            user=user,
+            total_items=sum(item.quantity for item in items),
+            total_price=sum((item.total_price for item in items), Decimal('0.00')),
+            **details,
+        )
+        OrderLine.objects.bulk_create(
+            OrderLine(
+                order=order,
+                product=item.product,
+                product_name=item.product.name,
+                price=item.product.price,
+                quantity=item.quantity,
+            )
+            for item in items
+        )
+        cart.delete()
+
+        # The UPDATE skips the save signals, and cached product pages show the stock
+        transaction.on_commit(lambda: cache.bump_version(cache.PRODUCTS))
+    return order
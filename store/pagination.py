@@ -0,0 +1,161 @@
+"""
+Keyset (seek) pagination for the product listing.
+
+Instead of OFFSET, each page continues from the sort key of the last row of
+the previous page, so deep pages cost the same as the first one as long as the
+ordering is backed by an index. Cursors are opaque signed tokens carrying the
+sort mode, the direction and the boundary row's key.
+"""
+from math import ceil
+
+from django.core import signing
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 48
+
+CURSOR_SALT = 'store.pagination.cursor'
+
+
+class CursorPage:
+    """One page of results plus the cursors of its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def get_page_size(request):
+    """Requested page size, bounded to MAX_PAGE_SIZE"""
+    try:
+        page_size = int(request.GET.get('per_page', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort_key, direction, values):
+    return signing.dumps([sort_key, direction, values], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, sort_key):
+    """Return (direction, values) for a valid cursor of this sort mode, else (None, None)"""
+    if not cursor:
+        return None, None
+    try:
+        cursor_sort, direction, values = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None, None
+    if cursor_sort != sort_key or direction not in ('next', 'previous'):
+        return None, None
+    return direction, values
+
+
+def _row_key(obj, fields):
+    return [str(getattr(obj, name.lstrip('-'))) for name in fields]
+
+
+def _seek_filter(model, fields, values, reverse):
+    """Rows strictly after `values` in the `fields` ordering (before it when reversed)
+
+    Each level is written as ``a >= x AND (a > x OR <next level>)`` so the
+    leading column gives the database a plain range condition to seek on.
+    """
+    condition = None
+    for name, raw_value in reversed(list(zip(fields, values))):
+        attname = name.lstrip('-')
+        value = model._meta.get_field(attname).to_python(raw_value)
+        descending = name.startswith('-') != reverse
+        strict = Q(**{f'{attname}__{"lt" if descending else "gt"}': value})
+        if condition is None:
+            condition = strict
+        else:
+            inclusive = Q(**{f'{attname}__{"lte" if descending else "gte"}': value})
+            condition = inclusive & (strict | condition)
+    return condition
+
+
+def _keyset_queryset(queryset, fields, sort_key, cursor):
+    """Ordered and filtered queryset for one keyset page, plus the decoded cursor"""
+    direction, values = decode_cursor(cursor, sort_key)
+    reverse = direction == 'previous'
+
+    ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in fields] if reverse else list(fields)
+    queryset = queryset.order_by(*ordering)
+    if values is not None:
+        queryset = queryset.filter(_seek_filter(queryset.model, fields, values, reverse))
+    return queryset, values, reverse
+
+
+def _keyset_page(rows, fields, sort_key, values, reverse, page_size):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    has_next = (not reverse and has_more) or (reverse and values is not None)
+    has_previous = (reverse and has_more) or (not reverse and values is not None)
+    next_cursor = previous_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(sort_key, 'next', _row_key(rows[-1], fields))
+    if rows and has_previous:
+        previous_cursor = encode_cursor(sort_key, 'previous', _row_key(rows[0], fields))
+    return CursorPage(rows, next_cursor, previous_cursor)
+
+
+def paginate_keyset(queryset, fields, sort_key, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Fetch one page of `queryset` ordered by `fields`, which must end in a unique field"""
+    queryset, values, reverse = _keyset_queryset(queryset, fields, sort_key, cursor)
+    rows = list(queryset[:page_size + 1])
+    return _keyset_page(rows, fields, sort_key, values, reverse, page_size)
+
+
+async def apaginate_keyset(queryset, fields, sort_key, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Async version of paginate_keyset"""
+    queryset, values, reverse = _keyset_queryset(queryset, fields, sort_key, cursor)
+    rows = [row async for row in queryset[:page_size + 1]]
+    return _keyset_page(rows, fields, sort_key, values, reverse, page_size)
+
+
+def paginate_offset(queryset, page_number, page_size=DEFAULT_PAGE_SIZE):
+    """Numbered pagination for orderings that have no usable keyset, such as search rank"""
+    paginator = Paginator(queryset, page_size)
+    try:
+        page = paginator.page(page_number)
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    return CursorPage(
+        list(page.object_list),
+        str(page.next_page_number()) if page.has_next() else None,
+        str(page.previous_page_number()) if page.has_previous() else None,
+    )
+
+
+async def apaginate_offset(queryset, page_number, page_size=DEFAULT_PAGE_SIZE):
+    """Async version of paginate_offset, with the same handling of invalid page numbers"""
+    num_pages = max(1, ceil(await queryset.acount() / page_size))
+    try:
+        number = int(page_number)
+    except (TypeError, ValueError):
+        number = 1
+    if not 1 <= number <= num_pages:
+        number = num_pages
+    offset = (number - 1) * page_size
+    rows = [row async for row in queryset[offset:offset + page_size]]
+    return CursorPage(
+        rows,
+        str(number + 1) if number < num_pages else None,
+        str(number - 1) if number > 1 else None,
+    )
@@ -0,0 +1,62 @@
+"""
+Placeholder images for products without a photo.
+
+Placeholders are rendered on request from one SVG template, parametrized by the
+category colour and the product name, instead of being stored as media files.
+Their URLs carry everything needed to render them plus a template version, so
+responses can be cached by browsers forever and by this process in memory.
+"""
+from functools import lru_cache
+
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.http import urlencode
+
+# Bump when the template below changes so cached placeholders are re-fetched
+PLACEHOLDER_VERSION = 1
+
+PLACEHOLDER_SIZE = 500
+
+MAX_LABEL_LENGTH = 60
+
+CATEGORY_COLORS = {
+    't-shirts': '#3498db',  # Blue for t-shirts
+    'jeans': '#2c3e50',  # Dark blue for jeans
+    'shirts': '#e74c3c',  # Red for shirts
+    'hoodies': '#f39c12',  # Orange for hoodies
+    'jackets': '#8e44ad',  # Purple for jackets
+    'dresses': '#16a085',  # Green for dresses
+}
+DEFAULT_COLOR = '#95a5a6'  # Gray default
+
+# Stands in for the slug of a product whose category is unknown
+DEFAULT_SLUG = 'default'
+
+SVG_TEMPLATE = (
+    '<svg width="{size}" height="{size}" viewBox="0 0 {size} {size}" xmlns="http://www.w3.org/2000/svg">'
+    '<rect width="{size}" height="{size}" fill="{color}"/>'
+    '<text x="50%" y="50%" font-family="Arial, sans-serif" font-size="24" fill="white" '
+    'text-anchor="middle" dominant-baseline="middle">{label}</text>'
+    '</svg>'
+)
+
+
+def placeholder_url(category_slug, label):
+    """URL of the placeholder for a product in the `category_slug` category named `label`"""
+    return '%s?%s' % (
+        reverse('store:placeholder', args=[category_slug or DEFAULT_SLUG]),
+        urlencode({'t': label[:MAX_LABEL_LENGTH], 'v': PLACEHOLDER_VERSION}),
+    )
+
+
+def category_color(category_slug):
+    return CATEGORY_COLORS.get(category_slug, DEFAULT_COLOR)
+
+
+@lru_cache(maxsize=2048)
+def render_placeholder(color, label):
+    return SVG_TEMPLATE.format(
+        size=PLACEHOLDER_SIZE,
+        color=color,
+        label=escape(label[:MAX_LABEL_LENGTH]),
+    ).encode('utf-8')
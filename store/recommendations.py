@@ -0,0 +1,44 @@
+"""
+"Frequently carted together" products for the product page.
+
+The neighbours are precomputed by the build_recommendations command into
+ProductRecommendation, so serving them is one indexed lookup on
+(product, rank). Products with too few recommendations (new products, or no
+cart data yet) are topped up with others from their category.
+"""
+from .models import Product
+
+RELATED_PRODUCTS_LIMIT = 4
+
+
+def recommended_products(product, limit=RELATED_PRODUCTS_LIMIT):
+    """Available products most often carted with `product`, best first"""
+    return Product.objects.filter(
+        recommended_in__product=product,
+        available=True,
+    ).order_by('recommended_in__rank')[:limit]
+
+
+def category_neighbours(product, exclude_ids, limit):
+    return Product.objects.filter(
+        category_id=product.category_id,
+        available=True,
+    ).exclude(id__in=[product.id, *exclude_ids])[:limit]
+
+
+def get_related_products(product, limit=RELATED_PRODUCTS_LIMIT):
+    """Recommended products, topped up from the same category"""
+    related = list(recommended_products(product, limit))
+    if len(related) < limit:
+        related += category_neighbours(product, [p.id for p in related], limit - len(related))
+    return related
+
+
+async def aget_related_products(product, limit=RELATED_PRODUCTS_LIMIT):
+    """Async version of get_related_products"""
+    related = [p async for p in recommended_products(product, limit)]
+    if len(related) < limit:
+        related += [
+            p async for p in category_neighbours(product, [p.id for p in related], limit - len(related))
+        ]
+    return related
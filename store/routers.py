@@ -0,0 +1,144 @@
+"""
+Database router that serves catalog reads from read replicas.
+
+Reads of the catalog models (REPLICATED_MODELS) go to one of the database
+aliases in STORE_DATABASE_REPLICAS, picked by STORE_REPLICA_SELECTION:
+``random`` spreads reads evenly, ``round_robin`` takes turns and ``ordered``
+prefers the first replica and falls back to the next. Carts, sessions, users
+and every write use the primary (``default``). Catalog reads also stay on the
+primary:
+
+* inside a transaction on the primary, so read-modify-write code sees its own rows;
+* while the request is pinned by ``store.middleware.ReplicaPinningMiddleware``,
+  which covers unsafe requests and the same visitor's requests for
+  STORE_REPLICA_PIN_SECONDS after one, so they read their own writes;
+* inside ``use_primary()`` blocks.
+
+A replica that refuses connections is skipped for STORE_REPLICA_RETRY_SECONDS,
+and reads fall back to the primary when no replica is available.
+"""
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger('store.routers')
+
+REPLICATED_MODELS = {'store.category', 'store.product', 'store.productrecommendation'}
+
+# True while catalog reads must see the primary's latest writes
+_pinned = ContextVar('store_replica_pinned', default=False)
+
+# Replica alias -> time.monotonic() before which it is skipped
+_unavailable = {}
+_unavailable_lock = threading.Lock()
+
+_turns = itertools.count()
+
+
+def get_replicas():
+    return list(getattr(settings, 'STORE_DATABASE_REPLICAS', []))
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def pin_to_primary():
+    """Send catalog reads in the current context to the primary; returns a token for unpin()"""
+    return _pinned.set(True)
+
+
+def unpin(token):
+    _pinned.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Read the catalog from the primary inside the block"""
+    token = pin_to_primary()
+    try:
+        yield
+    finally:
+        unpin(token)
+
+
+def mark_unavailable(alias):
+    retry = getattr(settings, 'STORE_REPLICA_RETRY_SECONDS', 30)
+    with _unavailable_lock:
+        _unavailable[alias] = time.monotonic() + retry
+    logger.warning('Database replica %r is unavailable; skipping it for %ss', alias, retry)
+
+
+def is_available(alias):
+    """False while a replica is marked down; otherwise connects to it if needed"""
+    with _unavailable_lock:
+        retry_at = _unavailable.get(alias)
+    if retry_at is not None and time.monotonic() < retry_at:
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        mark_unavailable(alias)
+        return False
+    if retry_at is not None:
+        with _unavailable_lock:
+            _unavailable.pop(alias, None)
+    return True
+
+
+def replica_order(replicas):
+    """Replicas in the order they should be tried, per STORE_REPLICA_SELECTION"""
+    selection = getattr(settings, 'STORE_REPLICA_SELECTION', 'random')
+    if selection == 'ordered':
+        return replicas
+    if selection == 'round_robin':
+        start = next(_turns) % len(replicas)
+    else:
+        start = random.randrange(len(replicas))
+    return replicas[start:] + replicas[:start]
+
+
+def choose_replica():
+    """Alias of an available replica, or the primary if there is none"""
+    replicas = get_replicas()
+    if not replicas:
+        return DEFAULT_DB_ALIAS
+    for alias in replica_order(replicas):
+        if is_available(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Catalog reads from replicas, everything else on the primary"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in REPLICATED_MODELS:
+            return DEFAULT_DB_ALIAS
+        if is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or Django would write instances back to the replica they were read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema from the primary through replication
+        if db in get_replicas():
+            return False
+        return None
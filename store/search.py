@@ -0,0 +1,142 @@
+"""
+Product search backends.
+
+The product listing delegates full-text search to a backend chosen by the
+``STORE_SEARCH_BACKEND`` setting (a dotted path) or, by default, by the
+database vendor: a weighted ``tsvector`` column with a GIN index on PostgreSQL
+and an FTS5 virtual table on SQLite. Backends return the filtered queryset
+annotated with ``search_rank`` (higher is better) and keep their index in sync
+through the signal handlers in ``store.signals``.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Category, Product
+
+SEARCH_CONFIG = 'english'
+
+FTS_TABLE = 'store_product_fts'
+
+
+class SimpleSearchBackend:
+    """Unindexed substring search, used on databases without full-text support"""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query)
+        ).annotate(search_rank=Value(1.0, output_field=FloatField()))
+
+    def index_products(self, queryset):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class PostgresSearchBackend(SimpleSearchBackend):
+    """Ranked search over the GIN-indexed ``Product.search_vector`` column"""
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        )
+
+    def index_products(self, queryset):
+        from django.contrib.postgres.search import SearchVector
+
+        category_name = Subquery(
+            Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1]
+        )
+        queryset.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG) +
+            SearchVector(category_name, weight='B', config=SEARCH_CONFIG) +
+            SearchVector('description', weight='C', config=SEARCH_CONFIG)
+        ))
+
+    def rebuild(self):
+        self.index_products(Product.objects.all())
+
+
+class SQLiteSearchBackend(SimpleSearchBackend):
+    """Ranked search over the ``store_product_fts`` FTS5 table, keyed by product id"""
+
+    # bm25() column weights for name, description and category
+    RANK_WEIGHTS = (10.0, 1.0, 5.0)
+
+    def build_match(self, query):
+        """Quote each term so user input can't inject FTS5 syntax; the last term matches as a prefix"""
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return ''
+        quoted = ['"%s"' % term for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def search(self, queryset, query):
+        match = self.build_match(query)
+        if not match:
+            # Still annotated, so callers can order by relevance
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        weights = ', '.join(str(weight) for weight in self.RANK_WEIGHTS)
+        table = Product._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        ).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+            [match],
+            output_field=FloatField(),
+        ))
+
+    def index_products(self, queryset):
+        ids_sql, params = queryset.values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({ids_sql})', params)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description, category) '
+                f'SELECT p.id, p.name, p.description, c.name '
+                f'FROM {Product._meta.db_table} p JOIN {Category._meta.db_table} c ON c.id = p.category_id '
+                f'WHERE p.id IN ({ids_sql})',
+                params,
+            )
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        self.index_products(Product.objects.all())
+
+
+VENDOR_BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_search_backend():
+    """Return the configured search backend, defaulting to one for the database vendor"""
+    backend_path = getattr(settings, 'STORE_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    return VENDOR_BACKENDS.get(connection.vendor, SimpleSearchBackend)()
@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache, images
+from .cart import reprice_carts
+from .models import Cart, Category, Product
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    """Keep the search index in sync with saved products"""
+    if raw:
+        return
+    get_search_backend().index_products(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """Drop deleted products from the search index"""
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(pre_save, sender=Product)
+def note_price_change(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    old_price = Product.objects.filter(pk=instance.pk).values_list('price', flat=True).first()
+    instance._price_changed = old_price is not None and old_price != instance.price
+
+
+@receiver(post_save, sender=Product)
+def reprice_product_carts(sender, instance, raw=False, **kwargs):
+    """Carts store their subtotal, so rebuild the ones holding a product whose price changed"""
+    if not raw and getattr(instance, '_price_changed', False):
+        reprice_carts([instance.pk])
+        instance._price_changed = False
+
+
+@receiver(pre_delete, sender=Product)
+def note_product_carts(sender, instance, **kwargs):
+    # Deleting the product cascades to its cart items, after which their carts can't be found
+    instance._cart_ids = list(Cart.objects.filter(items__product=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def reprice_deleted_product_carts(sender, instance, **kwargs):
+    cart_ids = getattr(instance, '_cart_ids', None)
+    if cart_ids:
+        Cart.objects.filter(pk__in=cart_ids).rebuild_totals()
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created=False, raw=False, **kwargs):
+    """Category names are indexed with their products, so re-index them on rename"""
+    if raw or created:
+        return
+    get_search_backend().index_products(Product.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def build_image_renditions(sender, instance, raw=False, **kwargs):
+    """Resize an uploaded image once here, so pages only ever look its renditions up"""
+    if raw or not instance.image:
+        return
+    name = instance.image.name
+    # Existing renditions are skipped, so saves that keep the image cost a few lookups
+    transaction.on_commit(lambda: images.generate_renditions(name))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories(sender, **kwargs):
+    # After commit, or a concurrent request could re-cache the old rows under the new version
+    transaction.on_commit(lambda: cache.bump_version(cache.CATEGORIES))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_products(sender, **kwargs):
+    transaction.on_commit(lambda: cache.bump_version(cache.PRODUCTS))
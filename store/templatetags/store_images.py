@@ -0,0 +1,43 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..images import get_renditions
+
+register = template.Library()
+
+DEFAULT_SIZES = '(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw'
+
+
+def _srcset(renditions):
+    return format_html_join(', ', '{} {}w', renditions)
+
+
+@register.simple_tag
+def responsive_image(image, alt='', css_class='', sizes=DEFAULT_SIZES, style='', loading='lazy', placeholder=''):
+    """<picture> with WebP and JPEG srcsets of an image's renditions
+
+    Falls back to a plain <img> of the original while it has no renditions,
+    and to the `placeholder` URL when there is no image at all.
+    """
+    if not image:
+        if not placeholder:
+            return ''
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" style="{}" loading="{}">',
+            placeholder, css_class, alt, style, loading,
+        )
+    webp = get_renditions(image, 'webp')
+    jpeg = get_renditions(image, 'jpeg')
+    if not webp or not jpeg:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" style="{}" loading="{}">',
+            image.url, css_class, alt, style, loading,
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" style="{}" loading="{}">'
+        '</picture>',
+        _srcset(webp), sizes,
+        jpeg[0][0], _srcset(jpeg), sizes, css_class, alt, style, loading,
+    )
@@ -0,0 +1,122 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from store.management.commands.add_product_images import IMAGE_STORE_PREFIX
+from store.models import Category, Product
+
+
+def png(colour):
+    output = BytesIO()
+    Image.new('RGB', (40, 40), colour).save(output, 'PNG')
+    return output.getvalue()
+
+
+class StubImageHandler(BaseHTTPRequestHandler):
+    """Serves server.images by path, counting how many requests are in flight at once"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            # Long enough for the other workers' requests to arrive meanwhile
+            time.sleep(0.2)
+            body, content_type = server.images.get(self.path, (None, None))
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AddProductImagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubImageHandler)
+        cls.server.lock = threading.Lock()
+        cls.server.in_flight = cls.server.max_in_flight = 0
+        cls.server.images = {
+            '/red.png': (png('red'), 'image/png'),
+            '/blue.png': (png('blue'), 'image/png'),
+            '/green.png': (png('green'), 'image/png'),
+            '/broken.jpg': (b'<html>Not an image</html>', 'image/jpeg'),
+        }
+        thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        thread.start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tops', slug='tops')
+        for slug in ('red-tee', 'red-cap', 'blue-tee', 'green-tee', 'missing-tee', 'broken-tee', 'stored-tee'):
+            Product.objects.create(name=slug, slug=slug, description='', price=10, category=category)
+        Product.objects.filter(slug='stored-tee').update(image=f'{IMAGE_STORE_PREFIX}00/stored.png')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.mapping = Path(media_root) / 'mapping.json'
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.server.server_port}{path}'
+
+    def test_downloads_from_mapping(self):
+        self.mapping.write_text(json.dumps({
+            'red-tee': self.url('/red.png'),
+            'red-cap': self.url('/red.png'),
+            'blue-tee': self.url('/blue.png'),
+            'green-tee': self.url('/green.png'),
+            'missing-tee': self.url('/missing.png'),
+            'broken-tee': self.url('/broken.jpg'),
+            'stored-tee': self.url('/green.png'),
+        }))
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                'add_product_images', mapping=str(self.mapping), workers=4, retries=0, timeout=5, stdout=out,
+            )
+        output = out.getvalue()
+
+        # Five distinct URLs over four workers
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertIn('Skipped 1 products that already have a stored image', output)
+        self.assertIn('2 products still need images', output)
+        images = dict(Product.objects.values_list('slug', 'image'))
+        self.assertEqual(images['missing-tee'], '')
+        self.assertEqual(images['broken-tee'], '')
+        self.assertEqual(images['stored-tee'], f'{IMAGE_STORE_PREFIX}00/stored.png')
+        # The shared URL was stored once for both products
+        self.assertEqual(images['red-tee'], images['red-cap'])
+        self.assertEqual(len({images[slug] for slug in ('red-tee', 'blue-tee', 'green-tee')}), 3)
+        self.assertTrue(all(images[slug].startswith(IMAGE_STORE_PREFIX) for slug in ('red-tee', 'blue-tee', 'green-tee')))
+        self.assertEqual(output.count('Added image for:'), 4)
+
+    def test_unreadable_mapping(self):
+        self.mapping.write_text('{not json')
+        with self.assertRaisesMessage(CommandError, 'Could not read mapping'):
+            call_command('add_product_images', mapping=str(self.mapping), stdout=StringIO())
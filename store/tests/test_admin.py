@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from store.models import Cart, CartItem, Category, Order, Product
+
+
+@override_settings(STORE_PERFORMANCE_ENABLED=False)
+class ChangelistQueryBudgetTests(TestCase):
+    """Changelists run a fixed number of queries however many rows they page through"""
+
+    # Session and user, then the count, the page with its related rows in one join,
+    # and for products the category filter's choices
+    CHANGELIST_QUERIES = {
+        'product': 5,
+        'order': 4,
+        'cart': 4,
+        'cartitem': 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.categories = [Category.objects.create(name=f'Category {i}', slug=f'category-{i}') for i in range(5)]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        start = Product.objects.count()
+        products = Product.objects.bulk_create(
+            Product(
+                name=f'Product {i}', slug=f'product-{i}', description='', price=10,
+                category=self.categories[i % len(self.categories)],
+            )
+            for i in range(start, start + count)
+        )
+        users = User.objects.bulk_create(User(username=f'shopper-{i}') for i in range(start, start + count))
+        carts = Cart.objects.bulk_create(Cart(user=user) for user in users)
+        CartItem.objects.bulk_create(CartItem(cart=cart, product=product) for cart, product in zip(carts, products))
+        Order.objects.bulk_create(
+            Order(
+                reference=f'REF{i:08d}', user=user, first_name='A', last_name='B', email='a@example.com',
+                phone='1', address='1 Main St', city='C', state='S', zip_code='1',
+            )
+            for i, user in zip(range(start, start + count), users)
+        )
+
+    def test_changelists(self):
+        for size in (10, 150):
+            self.add_rows(size - Product.objects.count())
+            for model, queries in self.CHANGELIST_QUERIES.items():
+                with self.subTest(model=model, rows=size):
+                    with self.assertNumQueries(queries):
+                        response = self.client.get(reverse(f'admin:store_{model}_changelist'))
+                    self.assertEqual(response.status_code, 200)
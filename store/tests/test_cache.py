@@ -0,0 +1,19 @@
+from django.core.cache import cache as django_cache
+from django.test import TestCase
+
+from store import cache
+from store.models import Category
+
+
+class InvalidationTests(TestCase):
+    def setUp(self):
+        django_cache.clear()
+
+    def test_version_bumped_after_commit(self):
+        version = cache.get_version(cache.CATEGORIES)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Category.objects.create(name='Jeans', slug='jeans')
+            # Until the write commits, readers keep caching under the old version
+            self.assertEqual(cache.get_version(cache.CATEGORIES), version)
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(cache.get_version(cache.CATEGORIES), version)
@@ -0,0 +1,56 @@
+import secrets
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from store.cart import CART_SESSION_KEY
+from store.models import Cart, CartItem, Category, Product
+
+
+@override_settings(STORE_PERFORMANCE_ENABLED=False)
+class CartQueryBudgetTests(TestCase):
+    """The cart and checkout pages run the same queries whatever the cart size"""
+
+    # Session, cart, then its items joined to their products and categories
+    CART_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = [Category.objects.create(name=f'Category {i}', slug=f'category-{i}') for i in range(5)]
+        cls.products = Product.objects.bulk_create(
+            Product(
+                name=f'Product {i}', slug=f'product-{i}', description='', price=10,
+                category=categories[i % len(categories)], stock=10,
+            )
+            for i in range(100)
+        )
+
+    def setUp(self):
+        # Warm the menu category cache so it doesn't count against the first request
+        cache.clear()
+        self.client.get(reverse('store:cart'))
+
+    def fill_cart(self, size):
+        cart = Cart.objects.create(session_key=secrets.token_hex(20))
+        CartItem.objects.bulk_create(CartItem(cart=cart, product=product) for product in self.products[:size])
+        Cart.objects.filter(pk=cart.pk).rebuild_totals()
+        session = self.client.session
+        session[CART_SESSION_KEY] = cart.session_key
+        session.save()
+
+    def test_cart_view(self):
+        for size in (1, 10, 100):
+            with self.subTest(size=size):
+                self.fill_cart(size)
+                with self.assertNumQueries(self.CART_QUERIES):
+                    response = self.client.get(reverse('store:cart'))
+                self.assertContains(response, f'Product {size - 1}<')
+
+    def test_checkout(self):
+        for size in (1, 10, 100):
+            with self.subTest(size=size):
+                self.fill_cart(size)
+                with self.assertNumQueries(self.CART_QUERIES):
+                    response = self.client.get(reverse('store:checkout'))
+                self.assertEqual(response.status_code, 200)
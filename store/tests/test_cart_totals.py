@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from store.cart import CART_SESSION_KEY, add_item
+from store.models import Cart, Category, Product
+
+
+@override_settings(STORE_PERFORMANCE_ENABLED=False)
+class StoredTotalsTests(TestCase):
+    """The stored cart totals follow product price changes and deletions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        cls.product = Product.objects.create(
+            name='Slim Denim', slug='slim-denim', description='', price='11.00', category=category, stock=10,
+        )
+        cls.other = Product.objects.create(
+            name='Belt', slug='belt', description='', price='5.00', category=category, stock=10,
+        )
+
+    def setUp(self):
+        self.cart = Cart.objects.create(session_key='totals')
+        add_item(self.cart, self.product, 2)
+        add_item(self.cart, self.other, 1)
+        session = self.client.session
+        session[CART_SESSION_KEY] = self.cart.session_key
+        session.save()
+
+    def summary(self):
+        return self.client.get(reverse('store:cart_summary')).json()
+
+    def test_price_change_reprices_carts(self):
+        self.product.price = Decimal('100.00')
+        self.product.save()
+        self.assertEqual(Decimal(str(self.summary()['cart_total_price'])), Decimal('205.00'))
+
+        item = self.cart.items.get(product=self.product)
+        response = self.client.post(
+            reverse('store:update_cart_quantity', args=[item.pk]), {'quantity': 3},
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+        self.assertEqual(Decimal(str(response.json()['item_total'])), Decimal('300.00'))
+        self.assertEqual(Decimal(str(response.json()['cart_total_price'])), Decimal('305.00'))
+
+    def test_deleted_product_leaves_carts(self):
+        self.product.delete()
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.total_items, self.cart.total_price), (1, Decimal('5.00')))
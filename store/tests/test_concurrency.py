@@ -0,0 +1,136 @@
+import threading
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from store.cart import InsufficientStock, add_item
+from store.models import Cart, CartItem, Category, OrderLine, Product
+from store.orders import place_order
+from store.tests.test_orders import DETAILS
+
+
+def run_concurrently(worker, count):
+    """Run `worker(n)` in `count` threads released together; returns any unexpected exceptions"""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(n):
+        try:
+            barrier.wait()
+            worker(n)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class ConcurrentAddToCartMixin:
+    """Simultaneous adds of one product never lose an update or oversell its stock"""
+
+    # Catalog reads outside a transaction go to the replica when one is configured
+    databases = '__all__'
+
+    THREADS = 8
+    ADDS_PER_THREAD = 25
+    STOCK = 150
+
+    def test_concurrent_adds(self):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        product = Product.objects.create(
+            name='Slim Denim', slug='slim-denim', description='', price='1.25', category=category, stock=self.STOCK,
+        )
+        cart = Cart.objects.create(session_key='concurrent')
+        refused = []
+
+        def worker(n):
+            for _ in range(self.ADDS_PER_THREAD):
+                try:
+                    add_item(cart, Product.objects.get(pk=product.pk), 1)
+                except InsufficientStock:
+                    refused.append(n)
+
+        self.assertEqual(run_concurrently(worker, self.THREADS), [])
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, self.STOCK)
+        self.assertEqual(len(refused), self.THREADS * self.ADDS_PER_THREAD - self.STOCK)
+        cart.refresh_from_db()
+        self.assertEqual(cart.total_items, self.STOCK)
+        self.assertEqual(cart.total_price, Decimal('1.25') * self.STOCK)
+
+
+class FlashSaleMixin:
+    """Simultaneous checkouts of a scarce product sell exactly its stock"""
+
+    databases = '__all__'
+
+    SHOPPERS = 40
+    STOCK = 50
+    QUANTITY = 2
+
+    def test_flash_sale(self):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        hot = Product.objects.create(
+            name='Limited Denim', slug='limited-denim', description='', price=100, category=category, stock=self.STOCK,
+        )
+        other = Product.objects.create(
+            name='Belt', slug='belt', description='', price=10, category=category, stock=self.SHOPPERS,
+        )
+        carts = []
+        for n in range(self.SHOPPERS):
+            cart = Cart.objects.create(session_key=f'shopper-{n}')
+            CartItem.objects.create(cart=cart, product=other, quantity=1)
+            CartItem.objects.create(cart=cart, product=hot, quantity=self.QUANTITY)
+            carts.append(cart)
+        orders, refused = [], []
+
+        def worker(n):
+            try:
+                orders.append(place_order(carts[n], **DETAILS))
+            except InsufficientStock as e:
+                refused.append(e.args[0])
+
+        self.assertEqual(run_concurrently(worker, self.SHOPPERS), [])
+        sold = self.STOCK // self.QUANTITY
+        self.assertEqual(len(orders), sold)
+        self.assertEqual(refused, [hot] * (self.SHOPPERS - sold))
+        hot.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(hot.stock, self.STOCK % self.QUANTITY)
+        # Refused checkouts keep none of the belts
+        self.assertEqual(other.stock, self.SHOPPERS - sold)
+        self.assertEqual(OrderLine.objects.filter(product=hot).count(), sold)
+        self.assertEqual(Cart.objects.count(), self.SHOPPERS - sold)
+
+
+class SQLiteMixin:
+    def setUp(self):
+        if connection.is_in_memory_db():
+            self.skipTest('needs a file-backed test database')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+class SQLiteConcurrentAddToCartTests(SQLiteMixin, ConcurrentAddToCartMixin, TransactionTestCase):
+    pass
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL only')
+class PostgreSQLConcurrentAddToCartTests(ConcurrentAddToCartMixin, TransactionTestCase):
+    THREADS = 16
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+class SQLiteFlashSaleTests(SQLiteMixin, FlashSaleMixin, TransactionTestCase):
+    pass
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL only')
+class PostgreSQLFlashSaleTests(FlashSaleMixin, TransactionTestCase):
+    pass
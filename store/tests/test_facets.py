@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+from django.core.cache import cache as django_cache
+from django.test import TestCase
+
+from store.facets import PRICE_BANDS, build_facets, facet_rows, filter_products, filter_ranges
+from store.models import Category, Product
+
+
+
+class FacetCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=f'Category {i}', slug=f'category-{i}') for i in range(3)]
+        prices = [Decimal('9.99'), Decimal('25.00'), Decimal('49.99'), Decimal('50.00'), Decimal('120.00')]
+        genders = [value for value, _ in Product.GENDER_CHOICES]
+        Product.objects.bulk_create(
+            Product(
+                name=f'Product {i}', slug=f'product-{i}', description='',
+                category=cls.categories[i % 3], gender=genders[i % len(genders)],
+                price=prices[i % len(prices)], stock=i % 4,
+            )
+            for i in range(120)
+        )
+
+    def setUp(self):
+        django_cache.clear()
+
+    def options(self):
+        """Every facet's option values, as filter_products takes them"""
+        return {
+            'category': [category.slug for category in self.categories],
+            'gender': [value for value, _ in Product.GENDER_CHOICES],
+            'price': [key for key, _, _, _ in PRICE_BANDS],
+            'in_stock': [True],
+        }
+
+    def selections(self):
+        """No selection, every single one and a few combinations"""
+        yield {}
+        for facet, values in self.options().items():
+            for value in values:
+                yield {facet: value}
+        yield {'category': 'category-1', 'gender': 'M'}
+        yield {'category': 'category-2', 'price': '25-50', 'in_stock': True}
+        yield {'gender': 'W', 'price': 'under-25', 'in_stock': True}
+
+    def assertCountsMatch(self, queryset, ranges=None):
+        rows = facet_rows(queryset, ranges=ranges)
+        for selected in self.selections():
+            with self.subTest(selected=selected, ranges=ranges):
+                facets, total = build_facets(rows, selected, self.categories)
+                self.assertEqual(total, filter_products(queryset, selected).count())
+                for facet, values in self.options().items():
+                    # Each facet's counts ignore that facet's own selection
+                    others = {name: value for name, value in selected.items() if name != facet}
+                    counts = {entry['value']: entry['count'] for entry in facets[facet]}
+                    for value in values:
+                        key = '1' if facet == 'in_stock' else value
+                        self.assertEqual(
+                            counts[key], filter_products(queryset, {**others, facet: value}).count(),
+                            f'{facet}={value}',
+                        )
+
+    def test_counts_match_filtered_counts(self):
+        self.assertCountsMatch(Product.objects.all())
+
+    def test_counts_match_within_price_range(self):
+        ranges = {'min_price': Decimal('20'), 'max_price': Decimal('60')}
+        self.assertCountsMatch(filter_ranges(Product.objects.all(), ranges), ranges)
@@ -0,0 +1,48 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from store import images
+from store.models import Product
+
+
+class RenditionTests(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+
+    def store_image(self, width, height):
+        output = BytesIO()
+        Image.new('RGB', (width, height), 'navy').save(output, 'PNG')
+        return default_storage.save('products/photo.png', ContentFile(output.getvalue()))
+
+    def test_renditions_are_only_looked_up(self):
+        name = self.store_image(600, 300)
+        field = Product(image=name).image
+        self.assertEqual(images.get_renditions(field, 'webp'), [])
+        with mock.patch.object(images.Image, 'open', wraps=Image.open) as image_open:
+            self.assertTrue(images.generate_renditions(name))
+        # Four renditions (two widths, two formats) from one read of the source
+        self.assertEqual(image_open.call_count, 1)
+        # Generating clears the cached miss
+        self.assertEqual([width for _, width in images.get_renditions(field, 'webp')], [320, 480])
+        self.assertEqual([width for _, width in images.get_renditions(field, 'jpeg')], [320, 480])
+
+    def test_unreadable_image_is_looked_up_again_later(self):
+        name = default_storage.save('products/photo.svg', ContentFile(b'<svg/>'))
+        with self.assertLogs('store.images', 'WARNING'):
+            self.assertFalse(images.generate_renditions(name))
+        with mock.patch.object(images.cache, 'set', wraps=images.cache.set) as cache_set:
+            self.assertEqual(images.get_renditions(Product(image=name).image, 'webp'), [])
+        cache_set.assert_called_with(images._cache_key(name, 'webp'), [], images.RENDITION_MISS_TIMEOUT)
@@ -0,0 +1,81 @@
+import csv
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from store.cart import add_item
+from store.models import Cart, Category, Product
+
+FIELDS = ['name', 'slug', 'price', 'original_price', 'category', 'stock', 'image']
+
+
+class ImportProductsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'feed.csv'
+
+    def import_rows(self, rows):
+        with self.path.open('w', newline='') as feed:
+            writer = csv.DictWriter(feed, FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        out = StringIO()
+        call_command('import_products', str(self.path), stdout=out)
+        return out.getvalue()
+
+    def test_feed_without_images_keeps_stored_images(self):
+        self.import_rows([
+            {'name': 'Tee', 'slug': 'tee', 'price': '10', 'category': 'tops', 'image': 'products/tee.jpg'},
+            {'name': 'Cap', 'slug': 'cap', 'price': '5', 'category': 'tops', 'image': 'products/cap.jpg'},
+        ])
+        self.import_rows([
+            {'name': 'Tee', 'slug': 'tee', 'price': '8', 'category': 'tops'},
+            {'name': 'Cap', 'slug': 'cap', 'price': '4', 'category': 'tops', 'image': 'products/cap-2.jpg'},
+        ])
+        self.assertEqual(
+            dict(Product.objects.values_list('slug', 'image')),
+            {'tee': 'products/tee.jpg', 'cap': 'products/cap-2.jpg'},
+        )
+        self.assertEqual(Product.objects.get(slug='tee').price, Decimal('8.00'))
+
+    def test_out_of_range_rows_are_skipped(self):
+        output = self.import_rows([
+            {'name': 'Tee', 'slug': 'tee', 'price': '10', 'category': 'tops', 'stock': '3'},
+            {'name': 'Negative stock', 'slug': 'neg-stock', 'price': '10', 'category': 'tops', 'stock': '-1'},
+            {'name': 'Negative price', 'slug': 'neg-price', 'price': '-1', 'category': 'tops'},
+            {'name': 'Huge price', 'slug': 'huge-price', 'price': '1e12', 'category': 'tops'},
+            {'name': 'Huge original', 'slug': 'huge-original', 'price': '1', 'original_price': '1e12', 'category': 'tops'},
+            {'name': 'No price', 'slug': 'nan-price', 'price': 'NaN', 'category': 'tops'},
+        ])
+        self.assertEqual(list(Product.objects.values_list('slug', flat=True)), ['tee'])
+        self.assertIn('Skipped 5 invalid rows', output)
+
+    def test_repriced_products_reprice_carts(self):
+        self.import_rows([{'name': 'Tee', 'slug': 'tee', 'price': '10', 'category': 'tops', 'stock': '5'}])
+        cart = Cart.objects.create(session_key='import')
+        add_item(cart, Product.objects.get(slug='tee'), 2)
+        self.import_rows([{'name': 'Tee', 'slug': 'tee', 'price': '12.50', 'category': 'tops', 'stock': '5'}])
+        cart.refresh_from_db()
+        self.assertEqual(cart.total_price, Decimal('25.00'))
+
+    def test_malformed_and_overlong_rows_are_skipped(self):
+        self.path = self.path.with_suffix('.jsonl')
+        rows = [
+            {'name': 'Tee', 'slug': 'tee', 'price': '10', 'category': 'tops'},
+            {'name': 'T' * 201, 'slug': 'long-name', 'price': '10', 'category': 'tops'},
+            {'name': 'Long slug', 'slug': 's' * 51, 'price': '10', 'category': 'tops'},
+            {'name': 'Long category', 'slug': 'long-category', 'price': '10', 'category': 'c' * 51},
+            ['not', 'an', 'object'],
+        ]
+        self.path.write_text('\n'.join([json.dumps(row) for row in rows] + ['{"name": "Cut off', '']))
+        out = StringIO()
+        call_command('import_products', str(self.path), stdout=out)
+        self.assertEqual(list(Product.objects.values_list('slug', flat=True)), ['tee'])
+        self.assertEqual(list(Category.objects.values_list('slug', flat=True)), ['tops'])
+        self.assertIn('Skipped 5 invalid rows', out.getvalue())
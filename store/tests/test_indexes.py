@@ -0,0 +1,58 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from store.models import Category, Product
+from store.views import PRODUCT_SORT_FIELDS
+
+# Storefront listing queries and the partial index each should be read through
+LISTING_INDEXES = {
+    'name': 'prod_avail_name_idx',
+    'price_low': 'prod_avail_price_idx',
+    'price_high': 'prod_avail_price_idx',
+    'newest': 'prod_avail_created_idx',
+    'discount': 'prod_avail_discount_idx',
+}
+
+
+class PartialIndexPlanTests(TestCase):
+    """The planner reads product listings through the prod_avail_* partial indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Jeans', slug='jeans')
+        Product.objects.bulk_create(
+            Product(
+                name=f'Product {i}', slug=f'product-{i}', description='', price=i % 50,
+                category=cls.category, gender='MWU'[i % 3], available=i % 10 != 0,
+            )
+            for i in range(2000)
+        )
+
+    def listings(self):
+        """(label, queryset, expected index) for each listing the storefront runs"""
+        available = Product.objects.filter(available=True)
+        for sort_by, ordering in PRODUCT_SORT_FIELDS.items():
+            yield sort_by, available.order_by(*ordering)[:24], LISTING_INDEXES[sort_by]
+        yield 'category', available.filter(category=self.category).order_by('name', 'id')[:24], 'prod_avail_cat_name_idx'
+        yield 'gender', available.filter(gender='M').order_by('name', 'id')[:24], 'prod_avail_gender_name_idx'
+
+    def assertPlansUseIndexes(self):
+        for label, queryset, index in self.listings():
+            with self.subTest(listing=label):
+                self.assertIn(index, queryset.explain())
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite EXPLAIN QUERY PLAN')
+    def test_sqlite_plans(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertPlansUseIndexes()
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL EXPLAIN')
+    def test_postgresql_plans(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE store_product')
+            # A test-sized table fits in a page or two, where a sequential scan always wins
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assertPlansUseIndexes()
@@ -0,0 +1,49 @@
+from django.test import TestCase
+
+from store import cache
+from store.cart import InsufficientStock
+from store.models import Cart, CartItem, Category, Order, Product
+from store.orders import place_order
+
+DETAILS = {
+    'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com', 'phone': '555 0100',
+    'address': '1 Main St', 'city': 'London', 'state': 'London', 'zip_code': 'N1',
+}
+
+
+class PlaceOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Jeans', slug='jeans')
+
+    def create_product(self, slug, stock):
+        return Product.objects.create(name=slug.title(), slug=slug, description='', price=10, category=self.category, stock=stock)
+
+    def test_insufficient_stock_names_the_short_product(self):
+        plenty = self.create_product('plenty', stock=5)
+        scarce = self.create_product('scarce', stock=1)
+        cart = Cart.objects.create(session_key='short')
+        # The product with enough stock comes first, and its stock is taken before the other is found short
+        CartItem.objects.create(cart=cart, product=plenty, quantity=3)
+        CartItem.objects.create(cart=cart, product=scarce, quantity=2)
+
+        with self.assertRaises(InsufficientStock) as raised:
+            place_order(cart, **DETAILS)
+        self.assertEqual(raised.exception.args[0], scarce)
+        self.assertEqual(dict(Product.objects.values_list('slug', 'stock')), {'plenty': 5, 'scarce': 1})
+        self.assertFalse(Order.objects.exists())
+
+    def test_order_refreshes_cached_product_pages(self):
+        product = self.create_product('denim', stock=5)
+        updated_at = product.updated_at
+        cart = Cart.objects.create(session_key='fresh')
+        CartItem.objects.create(cart=cart, product=product, quantity=2)
+        version = cache.get_version(cache.PRODUCTS)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(cart, **DETAILS)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 3)
+        # Both the page cache and conditional GETs key off these
+        self.assertGreater(product.updated_at, updated_at)
+        self.assertNotEqual(cache.get_version(cache.PRODUCTS), version)
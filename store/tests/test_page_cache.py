@@ -0,0 +1,87 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from store.cart import CART_SESSION_KEY, add_item
+from store.decorators import CSRF_PLACEHOLDER
+from store.models import Cart, Category, Product
+
+CSRF_TOKEN_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]*)"')
+
+
+@override_settings(STORE_PAGE_CACHE_TIMEOUT=300, STORE_PERFORMANCE_ENABLED=False)
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        cls.product = Product.objects.create(
+            name='Slim Denim', slug='slim-denim', description='', price=40, category=category, stock=5,
+        )
+        cls.url = reverse('store:product_detail', args=[cls.product.slug])
+
+    def setUp(self):
+        cache.clear()
+
+    def rename_behind_the_cache(self):
+        # update() skips the signals that would invalidate the cached page
+        Product.objects.filter(pk=self.product.pk).update(name='Renamed Denim')
+
+    def assertServedFromCache(self, client):
+        client.get(self.url)
+        self.rename_behind_the_cache()
+        response = client.get(self.url)
+        self.assertContains(response, 'Slim Denim')
+        self.assertIn('ETag', response)
+
+    def assertBypassesCache(self, client):
+        client.get(self.url)
+        self.rename_behind_the_cache()
+        response = client.get(self.url)
+        self.assertContains(response, 'Renamed Denim')
+        self.assertNotIn('ETag', response)
+
+    def test_anonymous_visitor_is_served_from_cache(self):
+        self.assertServedFromCache(self.client)
+
+    def test_authenticated_user_bypasses_cache(self):
+        self.client.force_login(User.objects.create_user('shopper'))
+        self.assertBypassesCache(self.client)
+
+    def test_visitor_with_cart_bypasses_cache(self):
+        cart = Cart.objects.create(session_key='cached')
+        add_item(cart, self.product, 1)
+        session = self.client.session
+        session[CART_SESSION_KEY] = cart.session_key
+        session.save()
+        self.assertBypassesCache(self.client)
+
+    def test_visitor_with_pending_message_bypasses_cache(self):
+        self.client.get(self.url)
+        # More than in stock: nothing is added, but an error message is left for the next page
+        self.client.post(reverse('store:add_to_cart', args=[self.product.pk]), {'quantity': 10})
+        self.rename_behind_the_cache()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Renamed Denim')
+        self.assertContains(response, 'Sorry, only 5 of')
+
+    def test_cached_page_gets_each_visitors_csrf_token(self):
+        Client().get(self.url)
+        visitor = Client(enforce_csrf_checks=True)
+        response = visitor.get(self.url)
+        tokens = set(CSRF_TOKEN_RE.findall(response.content.decode()))
+        self.assertTrue(tokens)
+        self.assertNotIn(CSRF_PLACEHOLDER, tokens)
+        # The substituted token is accepted for this visitor's POST
+        response = visitor.post(
+            reverse('store:add_to_cart', args=[self.product.pk]), {'csrfmiddlewaretoken': tokens.pop()},
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_matching_etag_gets_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core import signing
+from django.test import TestCase
+from django.utils import timezone
+
+from store.models import Category, Product
+from store.pagination import decode_cursor, encode_cursor, paginate_keyset
+from store.views import PRODUCT_SORT_FIELDS
+
+PAGE_SIZE = 7
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        # Few distinct values per sort column, so most rows tie with others on it
+        Product.objects.bulk_create(
+            Product(
+                name=f'Product {i % 4}', slug=f'product-{i}', description='', category=category,
+                price=Decimal(10 + i % 3), discount_percentage=(i % 5) * 10,
+            )
+            for i in range(50)
+        )
+        now = timezone.now()
+        for offset in range(3):
+            Product.objects.filter(pk__in=[p.pk for p in Product.objects.all() if p.pk % 3 == offset]).update(
+                created_at=now - timedelta(days=offset),
+            )
+
+    def walk(self, fields, sort_key, direction, cursor=None):
+        """Pages in the order visited, following `direction` cursors until there are none"""
+        pages = []
+        while True:
+            page = paginate_keyset(Product.objects.all(), fields, sort_key, cursor, PAGE_SIZE)
+            pages.append([product.pk for product in page.object_list])
+            cursor = page.next_cursor if direction == 'next' else page.previous_cursor
+            if cursor is None:
+                return pages, page
+
+    def test_every_sort_walks_both_ways(self):
+        for sort_key, fields in PRODUCT_SORT_FIELDS.items():
+            with self.subTest(sort=sort_key):
+                expected = list(Product.objects.order_by(*fields).values_list('pk', flat=True))
+                forward, last_page = self.walk(fields, sort_key, 'next')
+                self.assertEqual(sum(forward, []), expected)
+                self.assertTrue(all(len(page) == PAGE_SIZE for page in forward[:-1]))
+
+                # Back from the last page, through previous cursors only
+                backward, first_page = self.walk(fields, sort_key, 'previous', last_page.previous_cursor)
+                self.assertEqual(sum(reversed(backward), []), expected[:-len(forward[-1])])
+                self.assertFalse(first_page.has_previous)
+
+    def test_tampered_cursor_starts_over(self):
+        fields = PRODUCT_SORT_FIELDS['price_low']
+        first = paginate_keyset(Product.objects.all(), fields, 'price_low', None, PAGE_SIZE)
+        cursor = first.next_cursor
+        forged = signing.dumps(['price_low', 'next', ['0', '0']], salt='some other salt', compress=True)
+        for bad in (cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B'), forged, 'not-a-cursor'):
+            with self.subTest(cursor=bad):
+                self.assertEqual(decode_cursor(bad, 'price_low'), (None, None))
+                page = paginate_keyset(Product.objects.all(), fields, 'price_low', bad, PAGE_SIZE)
+                self.assertEqual(page.object_list, first.object_list)
+
+    def test_cursor_of_another_sort_is_rejected(self):
+        cursor = encode_cursor('name', 'next', ['Product 1', '3'])
+        self.assertEqual(decode_cursor(cursor, 'price_low'), (None, None))
+        self.assertEqual(decode_cursor(cursor, 'name'), ('next', ['Product 1', '3']))
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from store.models import Category, Product
+from store.placeholders import CATEGORY_COLORS, DEFAULT_COLOR
+
+
+class PlaceholderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Jeans', slug='jeans')
+        cls.product = Product.objects.create(
+            name='Slim Denim', slug='slim-denim', description='', price=40, category=cls.category,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_url_carries_the_category_slug(self):
+        self.assertTrue(self.product.placeholder_url.startswith('/placeholder/jeans.svg?'))
+
+    def test_reslugging_the_category_moves_the_url(self):
+        url = self.product.placeholder_url
+        self.category.slug = 'shirts'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertNotEqual(product.placeholder_url, url)
+        self.assertTrue(product.placeholder_url.startswith('/placeholder/shirts.svg?'))
+
+    def test_image_depends_only_on_the_url(self):
+        url = self.product.placeholder_url
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, CATEGORY_COLORS['jeans'])
+        self.assertIn('immutable', response['Cache-Control'])
+
+        self.category.slug = 'shirts'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertContains(self.client.get(url), CATEGORY_COLORS['jeans'])
+
+    def test_unknown_slug_gets_the_default_colour(self):
+        self.assertContains(self.client.get('/placeholder/socks.svg?t=Socks'), DEFAULT_COLOR)
@@ -0,0 +1,73 @@
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+
+from store.middleware import ReplicaPinningMiddleware
+from store.models import Cart, Category, Product, ProductRecommendation
+from store.routers import ReplicaRouter, use_primary
+
+
+@override_settings(STORE_DATABASE_REPLICAS=['replica'])
+@mock.patch('store.routers.is_available', return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_catalog_reads_go_to_replica(self, is_available):
+        for model in (Category, Product, ProductRecommendation):
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.router.db_for_read(model), 'replica')
+
+    def test_other_reads_and_all_writes_go_to_primary(self, is_available):
+        self.assertEqual(self.router.db_for_read(Cart), DEFAULT_DB_ALIAS)
+        for model in (Cart, Category, Product):
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.router.db_for_write(model), DEFAULT_DB_ALIAS)
+
+    def test_pinned_reads_go_to_primary(self, is_available):
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Product), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+
+    def test_unavailable_replica_falls_back_to_primary(self, is_available):
+        is_available.return_value = False
+        self.assertEqual(self.router.db_for_read(Product), DEFAULT_DB_ALIAS)
+
+    def test_replica_is_not_migrated(self, is_available):
+        self.assertIs(self.router.allow_migrate('replica', 'store', 'product'), False)
+        self.assertIsNone(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'store', 'product'))
+
+    def test_pin_cookie_keeps_reads_on_primary(self, is_available):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Product))
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.post('/cart/'))
+        self.assertIn(ReplicaPinningMiddleware.cookie_name, response.cookies)
+        factory.cookies[ReplicaPinningMiddleware.cookie_name] = '1'
+        middleware(factory.get('/products/'))
+        middleware(RequestFactory().get('/products/'))
+        self.assertEqual(seen, [DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS, 'replica'])
+
+
+@skipUnless('replica' in settings.DATABASES, 'set SQLITE_REPLICA to a second SQLite file')
+class SQLiteReplicaTests(TransactionTestCase):
+    """Against the replica alias that SQLITE_REPLICA configures in the development settings"""
+
+    # Not {'default', 'replica'}: the runner collects the aliases of skipped tests too
+    databases = '__all__'
+
+    def test_querysets_use_replica_outside_transactions(self):
+        Category.objects.create(name='Jeans', slug='jeans')
+        # The test replica mirrors default, so it sees the row at once
+        self.assertEqual(Category.objects.get().slug, 'jeans')
+        self.assertEqual(Category.objects.all().db, 'replica')
+        self.assertEqual(Cart.objects.all().db, DEFAULT_DB_ALIAS)
+        with transaction.atomic():
+            self.assertEqual(Category.objects.all().db, DEFAULT_DB_ALIAS)
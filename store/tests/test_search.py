@@ -0,0 +1,44 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from store.models import Category, Product
+from store.search import get_search_backend
+
+
+@override_settings(STORE_PERFORMANCE_ENABLED=False)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        Product.objects.create(name='Slim Denim', slug='slim-denim', description='Stretch denim', price=40, category=category)
+
+    def test_match_is_ranked(self):
+        results = get_search_backend().search(Product.objects.all(), 'denim').order_by('-search_rank')
+        self.assertEqual([product.slug for product in results], ['slim-denim'])
+
+    def test_query_without_words_matches_nothing_but_is_ranked(self):
+        for query in ('"', '!!', '-'):
+            with self.subTest(query=query):
+                results = get_search_backend().search(Product.objects.all(), query)
+                self.assertEqual(list(results.order_by('-search_rank')), [])
+
+    def test_listing_sorted_by_relevance_without_words(self):
+        for query in ('"', '!!', '-'):
+            with self.subTest(query=query):
+                response = self.client.get(reverse('store:product_list'), {'search': query})
+                self.assertEqual(response.status_code, 200)
+
+
+class SearchVectorLoadingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        Product.objects.create(name='Slim Denim', slug='slim-denim', description='', price=40, category=category)
+
+    def test_product_rows_leave_out_search_vector(self):
+        self.assertNotIn('search_vector', str(Product.objects.all().query))
+        self.assertEqual(Product.objects.get().get_deferred_fields(), {'search_vector'})
+
+    def test_search_still_filters_and_ranks(self):
+        products = get_search_backend().search(Product.objects.all(), 'denim')
+        self.assertEqual([product.slug for product in products.order_by('-search_rank')], ['slim-denim'])
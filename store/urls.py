@@ -1,15 +1,25 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'store'
 
+# Catalog pages and AJAX cart endpoints have async versions for ASGI deployments
+if getattr(settings, 'STORE_ASYNC_VIEWS', False):
+    from . import async_views as catalog_views
+else:
+    catalog_views = views
+
 urlpatterns = [
-    path('', views.home, name='home'),
-    path('products/', views.product_list, name='product_list'),
-    path('product/<slug:slug>/', views.product_detail, name='product_detail'),
+    path('', catalog_views.home, name='home'),
+    path('products/', catalog_views.product_list, name='product_list'),
+    path('product/<slug:slug>/', catalog_views.product_detail, name='product_detail'),
     path('cart/', views.cart_view, name='cart'),
+    path('placeholder/<slug:category_slug>.svg', views.placeholder, name='placeholder'),
+    path('cart/summary/', catalog_views.cart_summary, name='cart_summary'),
     path('checkout/', views.checkout, name='checkout'),
-    path('add-to-cart/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
-    path('remove-from-cart/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
-    path('update-cart-quantity/<int:item_id>/', views.update_cart_quantity, name='update_cart_quantity'),
-] 
\ No newline at end of file
+    path('order/<str:reference>/', views.order_confirmation, name='order_confirmation'),
+    path('add-to-cart/<int:product_id>/', catalog_views.add_to_cart, name='add_to_cart'),
+    path('remove-from-cart/<int:item_id>/', catalog_views.remove_from_cart, name='remove_from_cart'),
+    path('update-cart-quantity/<int:item_id>/', catalog_views.update_cart_quantity, name='update_cart_quantity'),
+]
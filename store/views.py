@@ -1,76 +1,147 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.db.models import Q
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.contrib.auth.decorators import login_required
-from .models import Product, Category, Cart, CartItem
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.views.decorators.http import require_GET
+from .models import Product, CartItem, Order
+from .cache import get_featured_products, get_menu_categories
+from .facets import (
+    DISCOUNT_STEPS, build_facets, facet_rows, filter_products, filter_ranges, get_range_filters,
+    get_selected_facets,
+)
+from .decorators import cache_anonymous_page
+from .forms import CheckoutForm
+from .cart import (
+    InsufficientStock, add_item, cart_summary_for, get_cart, get_cart_summary, get_or_create_cart, load_cart,
+    owns_cart, remove_item, set_item_quantity,
+)
+from .orders import EmptyCart, place_order
+from .recommendations import get_related_products
+from .placeholders import category_color, render_placeholder
+from .pagination import get_page_size, paginate_keyset, paginate_offset
+from .search import get_search_backend
 
 
+@cache_anonymous_page
 def home(request):
     """Home page with featured products"""
-    featured_products = Product.objects.filter(available=True).order_by('-created_at')[:8]
-    categories = Category.objects.all()
+    featured_products = get_featured_products()
     
+    # Categories come from the store.context_processors.categories menu cache
     context = {
         'featured_products': featured_products,
-        'categories': categories,
     }
     return render(request, 'store/home.html', context)
 
 
-def product_list(request):
-    """Product listing page with filtering"""
+# Keyset orderings per sort mode; each ends in the primary key so it is unique
+PRODUCT_SORT_FIELDS = {
+    'name': ('name', 'id'),
+    'price_low': ('price', 'id'),
+    'price_high': ('-price', '-id'),
+    'newest': ('-created_at', '-id'),
+    'discount': ('-discount_percentage', '-id'),
+}
+
+RELEVANCE_ORDERING = ('-search_rank', 'name', 'id')
+
+# Query parameters set by the price and discount form, which carries the rest as hidden fields
+RANGE_PARAMS = ('min_price', 'max_price', 'on_sale', 'min_discount')
+
+
+def listing_url(request, param, value=None):
+    """Current URL's query string with `param` set to `value` (or removed), from the first page"""
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    query.pop('page', None)
+    if value is None:
+        query.pop(param, None)
+    else:
+        query[param] = value
+    return f'?{query.urlencode()}'
+
+
+def listing_query(request):
+    """Searched and range-filtered products for the listing, plus its filter state; runs no queries"""
     products = Product.objects.filter(available=True)
-    categories = Category.objects.all()
-    
-    # Filter by category
-    category_slug = request.GET.get('category')
-    if category_slug:
-        products = products.filter(category__slug=category_slug)
-    
-    # Filter by gender
-    gender = request.GET.get('gender')
-    if gender:
-        products = products.filter(gender=gender)
     
     # Search functionality
-    search_query = request.GET.get('search')
+    search_query = request.GET.get('search') or ''
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__name__icontains=search_query)
-        )
+        products = get_search_backend().search(products, search_query)
     
-    # Sort products
-    sort_by = request.GET.get('sort', 'name')
-    if sort_by == 'price_low':
-        products = products.order_by('price')
-    elif sort_by == 'price_high':
-        products = products.order_by('-price')
-    elif sort_by == 'newest':
-        products = products.order_by('-created_at')
-    else:
-        products = products.order_by('name')
+    # Price range and discount filters
+    ranges = get_range_filters(request)
+    products = filter_ranges(products, ranges)
     
-    context = {
-        'products': products,
-        'categories': categories,
-        'current_category': category_slug,
-        'current_gender': gender,
+    # Sort products, best matches first by default when searching
+    sort_by = request.GET.get('sort', 'relevance' if search_query else 'name')
+    if sort_by not in PRODUCT_SORT_FIELDS and not (sort_by == 'relevance' and search_query):
+        sort_by = 'name'
+    return products, search_query, ranges, get_selected_facets(request), sort_by
+
+
+def listing_context(request, page, facets, product_count, search_query, ranges, selected, sort_by):
+    """Template context for a fetched page of the product listing"""
+    # Search rank has no index to seek on, so relevance pages are numbered
+    page_param = 'page' if sort_by == 'relevance' else 'cursor'
+    for param, values in facets.items():
+        for value in values:
+            value['url'] = listing_url(request, param, None if value['selected'] else value['value'])
+    return {
+        'products': page.object_list,
+        'product_count': product_count,
+        'page': page,
+        'next_page_url': listing_url(request, page_param, page.next_cursor) if page.has_next else None,
+        'previous_page_url': listing_url(request, page_param, page.previous_cursor) if page.has_previous else None,
+        'facets': facets,
+        'all_categories_url': listing_url(request, 'category'),
+        'all_genders_url': listing_url(request, 'gender'),
+        'all_prices_url': listing_url(request, 'price'),
+        'current_category': selected.get('category'),
+        'current_gender': selected.get('gender'),
+        'current_price': selected.get('price'),
+        'ranges': ranges,
+        'discount_steps': DISCOUNT_STEPS,
+        'range_hidden_params': [
+            (name, value) for name, value in request.GET.items()
+            if name not in RANGE_PARAMS + ('cursor', 'page')
+        ],
         'search_query': search_query,
         'sort_by': sort_by,
     }
+
+
+@cache_anonymous_page
+def product_list(request):
+    """Product listing page with filtering"""
+    products, search_query, ranges, selected, sort_by = listing_query(request)
+    
+    # Facet counts (and the number of results) come from one cached grouped query
+    # over the search results, before the category/gender/price/stock filters
+    facets, product_count = build_facets(
+        facet_rows(products, search_query, ranges), selected, get_menu_categories()
+    )
+    products = filter_products(products, selected)
+    
+    page_size = get_page_size(request)
+    if sort_by == 'relevance':
+        page = paginate_offset(products.order_by(*RELEVANCE_ORDERING), request.GET.get('page'), page_size)
+    else:
+        page = paginate_keyset(
+            products, PRODUCT_SORT_FIELDS[sort_by], sort_by, request.GET.get('cursor'), page_size
+        )
+    
+    context = listing_context(request, page, facets, product_count, search_query, ranges, selected, sort_by)
     return render(request, 'store/product_list.html', context)
 
 
+@cache_anonymous_page
 def product_detail(request, slug):
     """Product detail page"""
     product = get_object_or_404(Product, slug=slug, available=True)
-    related_products = Product.objects.filter(
-        category=product.category,
-        available=True
-    ).exclude(id=product.id)[:4]
+    related_products = get_related_products(product)
     
     context = {
         'product': product,
@@ -79,20 +150,6 @@ def product_detail(request, slug):
     return render(request, 'store/product_detail.html', context)
 
 
-def get_or_create_cart(request):
-    """Helper function to get or create cart"""
-    if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-    else:
-        session_key = request.session.session_key
-        if not session_key:
-            request.session.create()
-            session_key = request.session.session_key
-        
-        cart, created = Cart.objects.get_or_create(session_key=session_key)
-    return cart
-
-
 def add_to_cart(request, product_id):
     """Add product to cart"""
     if request.method == 'POST':
@@ -101,16 +158,15 @@ def add_to_cart(request, product_id):
         
         cart = get_or_create_cart(request)
         
-        # Check if product already in cart
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        try:
+            add_item(cart, product, max(quantity, 1))
+        except InsufficientStock:
+            message = f'Sorry, only {product.stock} of {product.name} in stock.'
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({'success': False, 'message': message}, status=409)
+            messages.error(request, message)
+            return redirect('store:product_detail', slug=product.slug)
+        cart.refresh_from_db(fields=['total_items', 'total_price'])
         
         messages.success(request, f'{product.name} added to cart!')
         
@@ -133,9 +189,8 @@ def remove_from_cart(request, item_id):
         cart = cart_item.cart
         
         # Check if user owns this cart
-        if (request.user.is_authenticated and cart.user == request.user) or \
-           (not request.user.is_authenticated and cart.session_key == request.session.session_key):
-            cart_item.delete()
+        if owns_cart(request, cart):
+            remove_item(cart_item)
             messages.success(request, 'Item removed from cart!')
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -154,24 +209,28 @@ def remove_from_cart(request, item_id):
 def update_cart_quantity(request, item_id):
     """Update cart item quantity"""
     if request.method == 'POST':
-        cart_item = get_object_or_404(CartItem, id=item_id)
+        cart_item = get_object_or_404(CartItem.objects.select_related('product'), id=item_id)
         cart = cart_item.cart
+        message = None
         
         # Check if user owns this cart
-        if (request.user.is_authenticated and cart.user == request.user) or \
-           (not request.user.is_authenticated and cart.session_key == request.session.session_key):
+        if owns_cart(request, cart):
             quantity = int(request.POST.get('quantity', 1))
-            if quantity > 0:
-                cart_item.quantity = quantity
-                cart_item.save()
-            else:
-                cart_item.delete()
+            try:
+                set_item_quantity(cart_item, quantity)
+            except InsufficientStock:
+                message = f'Sorry, only {cart_item.product.stock} of {cart_item.product.name} in stock.'
+                cart_item.refresh_from_db(fields=['quantity'])
+                if request.headers.get('X-Requested-With') != 'XMLHttpRequest':
+                    messages.error(request, message)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             # Refresh cart to get updated totals
             cart.refresh_from_db()
             return JsonResponse({
-                'success': True,
+                'success': message is None,
+                'message': message,
+                'quantity': cart_item.quantity,
                 'cart_total': cart.total_items,
                 'item_total': cart_item.total_price,
                 'cart_total_price': cart.total_price
@@ -182,23 +241,81 @@ def update_cart_quantity(request, item_id):
 
 def cart_view(request):
     """Cart page"""
-    cart = get_or_create_cart(request)
+    # Visitors who never added anything have no cart row, and get none from looking
+    cart = get_cart(request)
+    if cart is not None:
+        load_cart(cart)
     
     context = {
         'cart': cart,
+        'cart_summary': cart_summary_for(cart),
     }
     return render(request, 'store/cart.html', context)
 
 
+@require_GET
+def placeholder(request, category_slug):
+    """SVG stand-in for a product image, rendered from the category colour and name"""
+    svg = render_placeholder(category_color(category_slug), request.GET.get('t', ''))
+    response = HttpResponse(svg, content_type='image/svg+xml')
+    
+    # Everything that shapes the image is in the URL, so it never changes
+    patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    return response
+
+
+@require_GET
+def cart_summary(request):
+    """Cart item count and subtotal as JSON for the navbar badge"""
+    summary = get_cart_summary(request)
+    response = JsonResponse({
+        'cart_total': summary['cart_total'],
+        'cart_total_price': summary['cart_total_price'],
+    })
+    
+    # Private to the visitor and revalidated on every use, so an unchanged cart costs a 304
+    patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
 def checkout(request):
-    """Checkout page"""
-    cart = get_or_create_cart(request)
+    """Checkout page; posting the shipping form places the order"""
+    cart = get_cart(request)
+    if cart is not None:
+        load_cart(cart)
     
-    if cart.total_items == 0:
+    if cart is None or cart.total_items == 0:
         messages.warning(request, 'Your cart is empty!')
         return redirect('store:cart')
     
+    user = request.user if request.user.is_authenticated else None
+    initial = {'first_name': user.first_name, 'last_name': user.last_name, 'email': user.email} if user else None
+    form = CheckoutForm(request.POST or None, initial=initial)
+    if request.method == 'POST' and form.is_valid():
+        try:
+            order = place_order(cart, user, **form.cleaned_data)
+        except EmptyCart:
+            messages.warning(request, 'Your cart is empty!')
+            return redirect('store:cart')
+        except InsufficientStock as exc:
+            product = exc.args[0]
+            if product.available:
+                messages.error(request, f'Sorry, only {product.stock} of {product.name} in stock.')
+            else:
+                messages.error(request, f'Sorry, {product.name} is no longer available.')
+            return redirect('store:cart')
+        return redirect('store:order_confirmation', reference=order.reference)
+    
     context = {
         'cart': cart,
+        'cart_summary': cart_summary_for(cart),
+        'form': form,
     }
-    return render(request, 'store/checkout.html', context) 
\ No newline at end of file
+    return render(request, 'store/checkout.html', context)
+
+
+def order_confirmation(request, reference):
+    """Placed order; the random reference in the URL is what keeps it private"""
+    order = get_object_or_404(Order, reference=reference)
+    return render(request, 'store/order_confirmation.html', {'order': order})